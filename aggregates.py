@@ -0,0 +1,212 @@
+import sqlite3
+
+from schema import quote_identifier
+
+CLIENT_TYPES_TABLE = "SummaryClientTypes"
+FLAGS_TABLE = "SummaryFlags"
+TOTALS_TABLE = "SummaryTotals"
+TRIGGER_PREFIX = "trg_summary"
+
+# Item 5.D client types (a) to (n)
+CLIENT_TYPES = [
+    ("a", "Individuals (other than high net worth individuals)"),
+    ("b", "High net worth individuals"),
+    ("c", "Banking or thrift institutions"),
+    ("d", "Investment companies"),
+    ("e", "Business development companies"),
+    ("f", "Pooled investment vehicles (other than investment companies and business development companies)"),
+    ("g", "Pension and profit sharing plans (but not the plan participants or government pension plans)"),
+    ("h", "Charitable organizations"),
+    ("i", "State or municipal government entities (including government pension plans)"),
+    ("j", "Other investment advisers"),
+    ("k", "Insurance companies"),
+    ("l", "Sovereign wealth funds and foreign official institutions"),
+    ("m", "Corporations or other businesses not listed above"),
+    ("n", "Other"),
+]
+
+# Y/N metrics: name, description, columns, and whether all columns must be "N" (small entity),
+# any column must be "Y", or the single column must be "Y"
+FLAG_METRICS = [
+    ("9A(1)(a)", "Adviser has custody of client cash or bank accounts", ["9A(1)(a)"], "yes"),
+    ("9A(1)(b)", "Adviser has custody of client securities", ["9A(1)(b)"], "yes"),
+    ("custody_any", "Adviser has custody of client cash or securities (9A(1)(a) or 9A(1)(b))",
+     ["9A(1)(a)", "9A(1)(b)"], "any"),
+    ("9B(1)(a)", "Related person has custody of client cash or bank accounts", ["9B(1)(a)"], "yes"),
+    ("9B(1)(b)", "Related person has custody of client securities", ["9B(1)(b)"], "yes"),
+    ("small_entity", "Small registered investment adviser (No to 12A, 12B(1), 12B(2), 12C(1) and 12C(2))",
+     ["12A", "12B(1)", "12B(2)", "12C(1)", "12C(2)"], "none"),
+    ("5E(1)", "Compensated with a percentage of assets under management", ["5E(1)"], "yes"),
+    ("5E(2)", "Compensated with hourly charges", ["5E(2)"], "yes"),
+    ("5E(3)", "Compensated with subscription fees", ["5E(3)"], "yes"),
+    ("5E(4)", "Compensated with fixed fees", ["5E(4)"], "yes"),
+    ("5E(5)", "Compensated with commissions", ["5E(5)"], "yes"),
+    ("5E(6)", "Compensated with performance-based fees", ["5E(6)"], "yes"),
+    ("5E(7)", "Compensated in another way", ["5E(7)"], "yes"),
+    ("5G(2)", "Provides portfolio management for individuals and/or small businesses", ["5G(2)"], "yes"),
+    ("5G(3)", "Provides portfolio management for investment companies", ["5G(3)"], "yes"),
+    ("5G(4)", "Provides portfolio management for pooled investment vehicles", ["5G(4)"], "yes"),
+    ("5G(5)", "Provides portfolio management for businesses or institutional clients", ["5G(5)"], "yes"),
+    ("portfolio_management_any", "Provides any portfolio management service (5G(2) to 5G(5))",
+     ["5G(2)", "5G(3)", "5G(4)", "5G(5)"], "any"),
+    ("5I(1)", "Participates in a wrap fee program", ["5I(1)"], "yes"),
+]
+
+# Numeric totals from Item 9.A.(2) and 9.B.(2)
+TOTAL_METRICS = [
+    ("9A(2)(a)", "Approximate amount of client funds and securities in the adviser's custody", "9A(2)(a)"),
+    ("9A(2)(b)", "Number of clients for which the adviser has custody", "9A(2)(b)"),
+    ("9B(2)(a)", "Approximate amount of client funds and securities in related persons' custody", "9B(2)(a)"),
+    ("9B(2)(b)", "Number of clients for which related persons have custody", "9B(2)(b)"),
+]
+
+
+def column_ref(prefix, column):
+    return f"{prefix}{quote_identifier(column)}"
+
+
+# One (summary table, key, {summary column: expression over a row}) entry per maintained metric.
+# `prefix` is "NEW." / "OLD." inside triggers and "" for the initial build.
+def summary_terms(columns, prefix=""):
+    available = set(columns)
+    terms = []
+    for letter, description in CLIENT_TYPES:
+        clients, raum = f"5D({letter})(1)", f"5D({letter})(3)"
+        if clients in available and raum in available:
+            terms.append((CLIENT_TYPES_TABLE, f"5D({letter})", {
+                "advisers": f"(COALESCE({column_ref(prefix, clients)}, 0) > 0)",
+                "clients": f"COALESCE({column_ref(prefix, clients)}, 0)",
+                "raum": f"COALESCE({column_ref(prefix, raum)}, 0)",
+            }))
+    for name, description, flag_columns, rule in FLAG_METRICS:
+        if not all(col in available for col in flag_columns):
+            continue
+        refs = [column_ref(prefix, col) for col in flag_columns]
+        if rule == "none":
+            yes = " AND ".join(f"{ref} = 0" for ref in refs)
+            known = " AND ".join(f"{ref} IS NOT NULL" for ref in refs)
+        elif rule == "any":
+            yes = " OR ".join(f"{ref} = 1" for ref in refs)
+            known = " OR ".join(f"{ref} IS NOT NULL" for ref in refs)
+        else:
+            yes = f"{refs[0]} = 1"
+            known = f"{refs[0]} IS NOT NULL"
+        terms.append((FLAGS_TABLE, name, {
+            "advisers_yes": f"COALESCE({yes}, 0)",
+            "advisers_answered": f"({known})",
+        }))
+    for name, description, column in TOTAL_METRICS:
+        if column in available:
+            terms.append((TOTALS_TABLE, name, {
+                "total": f"COALESCE({column_ref(prefix, column)}, 0)",
+                "advisers_reporting": f"({column_ref(prefix, column)} IS NOT NULL)",
+            }))
+    terms.append((TOTALS_TABLE, "advisers", {"total": "1", "advisers_reporting": "1"}))
+    return terms
+
+
+def descriptions():
+    described = {f"5D({letter})": description for letter, description in CLIENT_TYPES}
+    described.update({name: description for name, description, _, _ in FLAG_METRICS})
+    described.update({name: description for name, description, _ in TOTAL_METRICS})
+    described["advisers"] = "Number of advisers in RegisteredAdvisors"
+    return described
+
+
+def create_summary_tables(conn):
+    conn.execute(f"DROP TABLE IF EXISTS {CLIENT_TYPES_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {FLAGS_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {TOTALS_TABLE}")
+    conn.execute(
+        f"""CREATE TABLE {CLIENT_TYPES_TABLE} (
+            item TEXT PRIMARY KEY,
+            client_type TEXT NOT NULL,
+            advisers INTEGER NOT NULL,
+            clients INTEGER NOT NULL,
+            raum REAL NOT NULL
+        )"""
+    )
+    conn.execute(
+        f"""CREATE TABLE {FLAGS_TABLE} (
+            item TEXT PRIMARY KEY,
+            description TEXT NOT NULL,
+            advisers_yes INTEGER NOT NULL,
+            advisers_answered INTEGER NOT NULL
+        )"""
+    )
+    conn.execute(
+        f"""CREATE TABLE {TOTALS_TABLE} (
+            item TEXT PRIMARY KEY,
+            description TEXT NOT NULL,
+            total REAL NOT NULL,
+            advisers_reporting INTEGER NOT NULL
+        )"""
+    )
+
+
+# Triggers keep the summaries current as delta ingests insert, update and delete adviser rows
+def create_summary_triggers(conn, table, columns):
+    for event, sources in (("INSERT", [("NEW.", "+")]), ("DELETE", [("OLD.", "-")]),
+                           ("UPDATE", [("OLD.", "-"), ("NEW.", "+")])):
+        statements = []
+        for prefix, sign in sources:
+            for summary_table, item, expressions in summary_terms(columns, prefix):
+                assignments = ", ".join(f"{col} = {col} {sign} {expr}" for col, expr in expressions.items())
+                statements.append(f"UPDATE {summary_table} SET {assignments} WHERE item = '{item}';")
+        name = f"{TRIGGER_PREFIX}_{event.lower()}"
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON {quote_identifier(table)} BEGIN\n"
+            + "\n".join(statements) + "\nEND"
+        )
+
+
+# Compute every summary with a single scan of the table and install the maintenance triggers
+def build_summaries(conn, table):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+    create_summary_tables(conn)
+    terms = summary_terms(columns)
+    select = ", ".join(
+        f"SUM({expr})" for _, _, expressions in terms for expr in expressions.values()
+    )
+    values = iter(conn.execute(f"SELECT {select} FROM {quote_identifier(table)}").fetchone())
+    described = descriptions()
+    for summary_table, item, expressions in terms:
+        sums = [next(values) or 0 for _ in expressions]
+        if summary_table == CLIENT_TYPES_TABLE:
+            conn.execute(f"INSERT INTO {summary_table} VALUES (?, ?, ?, ?, ?)", (item, described[item], *sums))
+        else:
+            conn.execute(f"INSERT INTO {summary_table} VALUES (?, ?, ?, ?)", (item, described[item], *sums))
+    create_summary_triggers(conn, table, columns)
+
+
+def summaries_exist(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?", (f"{TRIGGER_PREFIX}_%",)
+    ).fetchone()[0] == 3
+
+
+# Text block describing the summary tables and their contents for the Part 2 prompt
+def describe_summaries(conn):
+    try:
+        client_types = conn.execute(f"SELECT item, client_type FROM {CLIENT_TYPES_TABLE} ORDER BY item").fetchall()
+        flags = conn.execute(f"SELECT item, description FROM {FLAGS_TABLE} ORDER BY item").fetchall()
+        totals = conn.execute(f"SELECT item, description FROM {TOTALS_TABLE} ORDER BY item").fetchall()
+    except sqlite3.OperationalError:
+        return ""
+    lines = [
+        f"{CLIENT_TYPES_TABLE}(item, client_type, advisers, clients, raum): one row per Item 5.D client type; "
+        "advisers = advisers with at least one client of that type, clients = SUM of 5D(x)(1), "
+        "raum = SUM of 5D(x)(3) (regulatory assets under management in dollars).",
+    ]
+    lines += [f"    item '{item}': {client_type}" for item, client_type in client_types]
+    lines.append(
+        f"{FLAGS_TABLE}(item, description, advisers_yes, advisers_answered): counts of advisers answering Yes, "
+        "per Y/N item or combined definition. Divide advisers_yes by the 'advisers' total for fractions of all advisers."
+    )
+    lines += [f"    item '{item}': {description}" for item, description in flags]
+    lines.append(
+        f"{TOTALS_TABLE}(item, description, total, advisers_reporting): SUM of a numeric item over all advisers."
+    )
+    lines += [f"    item '{item}': {description}" for item, description in totals]
+    return "\n".join(lines)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+ANSWER_CACHE_DIR = "answer_cache"
+ANSWER_CACHE_PATH = os.path.join(ANSWER_CACHE_DIR, "answers.db")
+# Entries older than this are recomputed; each stage keeps at most MAX_ENTRIES, least recently used dropped first
+ANSWER_TTL_SECONDS = int(os.getenv("ANSWER_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_ENTRIES = 2000
+
+PART1, SQL, RESULT, FINAL, FAST = "part1", "sql", "result", "final", "fast"
+
+
+# Case, spacing and trailing punctuation do not change what is being asked
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question or "").strip().rstrip("?.! ").lower()
+
+
+def content_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def connect_answer_cache(path=ANSWER_CACHE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS Answers (
+            stage TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stage, key)
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_lru ON Answers (stage, last_used_at)")
+    return conn
+
+
+def get_answer(stage, key, ttl=ANSWER_TTL_SECONDS, path=ANSWER_CACHE_PATH):
+    conn = connect_answer_cache(path)
+    try:
+        row = conn.execute("SELECT value, created_at FROM Answers WHERE stage = ? AND key = ?", (stage, key)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            if time.time() - row[1] > ttl:
+                conn.execute("DELETE FROM Answers WHERE stage = ? AND key = ?", (stage, key))
+                return None
+            conn.execute(
+                "UPDATE Answers SET last_used_at = ?, hits = hits + 1 WHERE stage = ? AND key = ?", (time.time(), stage, key)
+            )
+        return json.loads(row[0])
+    finally:
+        conn.close()
+
+
+def put_answer(stage, key, value, path=ANSWER_CACHE_PATH):
+    conn = connect_answer_cache(path)
+    try:
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO Answers (stage, key, value, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (stage, key, json.dumps(value), now, now),
+            )
+            conn.execute(
+                """DELETE FROM Answers WHERE stage = ? AND key IN (
+                    SELECT key FROM Answers WHERE stage = ? ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (stage, stage, MAX_ENTRIES),
+            )
+    finally:
+        conn.close()
+
+
+# Return the cached value for `stage` and the key parts, computing and storing it on a miss.
+# Returns (value, hit). Empty results (None, "") are not cached so failures are retried.
+def cached_answer(stage, key_parts, compute, ttl=ANSWER_TTL_SECONDS, path=ANSWER_CACHE_PATH):
+    key = cache_key(stage, *key_parts)
+    value = get_answer(stage, key, ttl, path)
+    if value is not None:
+        return value, True
+    value = compute()
+    if value not in (None, ""):
+        put_answer(stage, key, value, path)
+    return value, False
+
+
+# Version of the data a query runs against: the database file, its latest ingest and the schema version,
+# plus the same for every database attached next to it (a missing one counts as never loaded)
+def data_version(db_path, schema_version, attached=()):
+    versions = []
+    for path in [db_path, *attached]:
+        ingest_id = None
+        if path == db_path or os.path.exists(path):
+            conn = sqlite3.connect(path)
+            try:
+                ingest_id = conn.execute("SELECT MAX(ingest_id) FROM Ingests").fetchone()[0]
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.close()
+        versions.append(f"{os.path.abspath(path)}:{ingest_id}")
+    return ":".join(versions) + f":v{schema_version}"
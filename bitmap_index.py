@@ -0,0 +1,127 @@
+import json
+import os
+
+import numpy as np
+
+from columnar import Evaluator, Unsupported, latest_ingest_id, load_sidecar, sidecar_dir, tokenize
+from schema import YES_NO
+
+BITMAP_FILE = "bitmaps.npy"
+BITMAP_META_FILE = "bitmaps.json"
+
+_loaded = {}
+
+
+def popcount(bits):
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bits).sum())
+    return int(np.unpackbits(bits).sum())
+
+
+# Pack every Y/N column of the sidecar into two bitsets, one bit per adviser:
+# "yes" (answered Y) and "known" (answered at all). Stored as one memory-mappable array.
+def build_bitmaps(db_path):
+    sidecar = load_sidecar(db_path)
+    if sidecar is None:
+        return None
+    meta = sidecar["meta"]
+    columns = [col for col, info in meta["columns"].items() if info["kind"] == YES_NO]
+    rows = meta["rows"]
+    width = (rows + 7) // 8
+    directory = sidecar_dir(db_path)
+    building = os.path.join(directory, BITMAP_FILE + ".building")
+    bitmaps = np.lib.format.open_memmap(building, mode="w+", dtype=np.uint8, shape=(len(columns), 2, width))
+    for i, column in enumerate(columns):
+        answers = np.asarray(sidecar["arrays"][column])
+        bitmaps[i, 0] = np.packbits(answers == 1)
+        bitmaps[i, 1] = np.packbits(answers >= 0)
+    bitmaps.flush()
+    del bitmaps
+    os.replace(building, os.path.join(directory, BITMAP_FILE))
+    with open(os.path.join(directory, BITMAP_META_FILE + ".building"), "w") as f:
+        json.dump({"rows": rows, "ingest_id": meta["ingest_id"], "columns": {col: i for i, col in enumerate(columns)}}, f)
+    os.replace(os.path.join(directory, BITMAP_META_FILE + ".building"), os.path.join(directory, BITMAP_META_FILE))
+    return len(columns)
+
+
+def load_bitmaps(db_path):
+    directory = sidecar_dir(db_path)
+    path = os.path.join(directory, BITMAP_META_FILE)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _loaded.get(db_path)
+    if cached and cached["stamp"] == stamp:
+        return cached
+    with open(path) as f:
+        meta = json.load(f)
+    bitmaps = np.load(os.path.join(directory, BITMAP_FILE), mmap_mode="r")
+    rows = meta["rows"]
+    all_rows = np.packbits(np.ones(rows, dtype=bool)) if rows else np.zeros(0, dtype=np.uint8)
+    cached = {"stamp": stamp, "meta": meta, "bitmaps": bitmaps, "all_rows": all_rows}
+    _loaded[db_path] = cached
+    return cached
+
+
+# The columnar evaluator's grammar restricted to COUNT(*) over Y/N conditions, evaluated on packed bitsets:
+# AND/OR/NOT become bitwise operations on (truth, known) pairs and counts become popcounts
+class BitmapEvaluator(Evaluator):
+    def __init__(self, tokens, loaded, table):
+        super().__init__(tokens, {"meta": {"rows": loaded["meta"]["rows"], "columns": {}}, "arrays": {}}, table)
+        self.columns = loaded["meta"]["columns"]
+        self.bitmaps = loaded["bitmaps"]
+        self.valid = loaded["all_rows"]
+
+    def all_rows(self):
+        return self.valid
+
+    def count(self, mask):
+        return popcount(mask)
+
+    def aggregate(self, name):
+        if name != "COUNT":
+            raise Unsupported("only COUNT(*) is answered from bitmaps")
+        self.expect("op", "(")
+        self.expect("op", "*")
+        self.expect("op", ")")
+        return self.count(self.mask)
+
+    def comparison(self):
+        token = self.expect("column")
+        index = self.columns.get(token[1])
+        if index is None:
+            raise Unsupported(f"{token[1]} is not a Y/N column")
+        yes, known = self.bitmaps[index, 0], self.bitmaps[index, 1]
+        if self.accept("word", "IS"):
+            negate = bool(self.accept("word", "NOT"))
+            self.expect("word", "NULL")
+            return (known if negate else self.valid & ~known), self.valid
+        kind, op = self.peek()
+        if kind != "op" or op not in ("=", "==", "!=", "<>"):
+            raise Unsupported("comparison")
+        self.pos += 1
+        negative = bool(self.accept("op", "-"))
+        value = float(self.expect("number")[1]) * (-1 if negative else 1)
+        if value == 1:
+            equal = yes
+        elif value == 0:
+            equal = known & ~yes
+        else:
+            equal = np.zeros_like(yes)
+        truth = equal if op in ("=", "==") else known & ~equal
+        return truth, known
+
+
+# Answer COUNT(*) / fraction queries over Y/N columns from the bitmaps.
+# Returns (True, value) when handled, (False, None) when another engine should run the query.
+def try_bitmap_count(db_path, query, table, conn=None):
+    loaded = load_bitmaps(db_path)
+    if loaded is None:
+        return False, None
+    if conn is not None and loaded["meta"]["ingest_id"] != latest_ingest_id(conn):
+        return False, None
+    try:
+        return True, BitmapEvaluator(tokenize(query), loaded, table).evaluate()
+    except Unsupported:
+        return False, None
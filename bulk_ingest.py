@@ -0,0 +1,271 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+from indexing import build_default_indexes, create_index
+from ingest import EmptySheetError, create_bookkeeping_tables, create_table, ingest_excel, log_ingest
+from schema import (
+    DATE, SQL_TYPES, TEXT, YES_NO, find_key_columns, load_catalog_rows, merge_kinds, quote_identifier, write_catalog
+)
+
+# The history lives in a database of its own, so it survives switching between uploaded snapshots, and is
+# attached read-only under the "history" schema when generated SQL runs
+HISTORY_DB_PATH = "AdviserHistory.db"
+HISTORY_SCHEMA = "history"
+REGISTERED_TABLE = "RegisteredAdvisorsHistory"
+EXEMPT_TABLE = "ExemptReportingAdvisersHistory"
+PART_TABLE = "Part"
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm")
+
+# Every merged row records where it came from
+TAG_COLUMNS = ["source_file", "sheet", "snapshot_date"]
+TAG_KINDS = [TEXT, TEXT, DATE]
+
+EXEMPT_PATTERN = re.compile(r"exempt|(^|[^a-z])era([^a-z]|$)", re.IGNORECASE)
+
+
+# Registered-adviser and exempt-reporting-adviser filings go to separate tables
+def target_table(file_name, sheet_name):
+    if EXEMPT_PATTERN.search(file_name) or EXEMPT_PATTERN.search(sheet_name):
+        return EXEMPT_TABLE
+    return REGISTERED_TABLE
+
+
+# Snapshot date from the file name (SEC files are named like ia010124.xlsx or 2024-01-01),
+# falling back to the file's modification date
+def snapshot_date(path):
+    name = os.path.basename(path)
+    patterns = [
+        (r"(20\d{2})[-_]?(\d{2})[-_]?(\d{2})", lambda m: (int(m[1]), int(m[2]), int(m[3]))),
+        (r"(?<!\d)(\d{2})(\d{2})(\d{2})(?!\d)", lambda m: (2000 + int(m[3]), int(m[1]), int(m[2]))),
+        (r"(20\d{2})[-_](\d{2})(?!\d)", lambda m: (int(m[1]), int(m[2]), 1)),
+    ]
+    for pattern, parts in patterns:
+        for match in re.finditer(pattern, name):
+            try:
+                return date(*parts(match)).isoformat()
+            except ValueError:
+                continue
+    return datetime.fromtimestamp(os.path.getmtime(path)).date().isoformat()
+
+
+# Workbook paths from a mix of files and directories
+def expand_sources(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith(WORKBOOK_SUFFIXES) and not name.startswith("~$"):
+                    paths.append(os.path.join(source, name))
+        else:
+            paths.append(source)
+    return paths
+
+
+def list_sheets(path):
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+# Worker process: parse one sheet into its own part database (typed, no summaries or indexes)
+def parse_sheet(path, sheet_name, part_path):
+    try:
+        return ingest_excel(path, part_path, PART_TABLE, sheet_name=sheet_name, incremental=False, derived=False)
+    except EmptySheetError:
+        return {"rows": 0}
+
+
+# A value of a column inferred as `kind`, as stored under the merged kind: Y/N answers become 'Y'/'N' once the
+# column has widened to text, anything else is converted by the column's type affinity
+def converted(ref, kind, merged_kind):
+    if kind == YES_NO and merged_kind == TEXT:
+        return f"CASE {ref} WHEN 1 THEN 'Y' WHEN 0 THEN 'N' END"
+    return ref
+
+
+# Rebuild the table with every column typed for its merged kind, converting the rows merged earlier the same
+# way new parts are converted, so a column that widened from Y/N to text holds no 1/0 answers and loses its
+# INTEGER affinity
+def retype_table(conn, table, existing, kinds):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+    merged = {column: kinds.get(column, existing.get(column, TEXT)) for column in columns}
+    retyped = f"_retype_{table}"
+    column_sql = ", ".join(quote_identifier(column) for column in columns)
+    expressions = ", ".join(
+        converted(quote_identifier(column), existing.get(column, merged[column]), merged[column]) for column in columns
+    )
+    with conn:
+        create_table(conn, retyped, columns, [SQL_TYPES[merged[column]] for column in columns])
+        conn.execute(
+            f"INSERT INTO {quote_identifier(retyped)} (rowid, {column_sql}) "
+            f"SELECT rowid, {expressions} FROM {quote_identifier(table)}"
+        )
+        conn.execute(f"DROP TABLE {quote_identifier(table)}")
+        conn.execute(f"ALTER TABLE {quote_identifier(retyped)} RENAME TO {quote_identifier(table)}")
+
+
+# Copy one part into its target table, replacing any earlier load of the same file and sheet
+def merge_part(conn, table, part, kinds):
+    part_kinds = part["kinds"]
+    columns = list(part_kinds)
+    conn.execute("ATTACH DATABASE ? AS part", (part["path"],))
+    try:
+        expressions = [
+            converted(f"part.{PART_TABLE}.{quote_identifier(column)}", part_kinds[column], kinds[column])
+            for column in columns
+        ]
+        column_sql = ", ".join(quote_identifier(col) for col in TAG_COLUMNS + columns)
+        with conn:
+            conn.execute(
+                f"DELETE FROM {quote_identifier(table)} WHERE source_file = ? AND sheet = ?",
+                (part["file_name"], part["sheet"]),
+            )
+            conn.execute(
+                f"INSERT INTO {quote_identifier(table)} ({column_sql}) "
+                f"SELECT ?, ?, ?, {', '.join(expressions)} FROM part.{PART_TABLE}",
+                (part["file_name"], part["sheet"], part["snapshot_date"]),
+            )
+    finally:
+        conn.execute("DETACH DATABASE part")
+
+
+# Create or widen the target table to the union of the parts' columns, re-typing it when a column's merged kind
+# has changed, then merge every part into it
+def merge_table(conn, table, parts):
+    existing = {column: kind for column, kind, _ in load_catalog_rows(conn, table)} if table_exists(conn, table) else {}
+    seen_kinds = {column: [kind] for column, kind in existing.items() if column not in TAG_COLUMNS}
+    for part in parts:
+        part_conn = sqlite3.connect(part["path"])
+        try:
+            part["kinds"] = {column: kind for column, kind, _ in load_catalog_rows(part_conn, PART_TABLE)}
+        finally:
+            part_conn.close()
+        for column, kind in part["kinds"].items():
+            seen_kinds.setdefault(column, []).append(kind)
+    kinds = {column: merge_kinds(column_kinds) for column, column_kinds in seen_kinds.items()}
+    columns = list(kinds)
+
+    if not existing:
+        definitions = [f"{quote_identifier(col)} {SQL_TYPES[kind]}" for col, kind in zip(TAG_COLUMNS, TAG_KINDS)]
+        definitions += [f"{quote_identifier(col)} {SQL_TYPES[kinds[col]]}" for col in columns]
+        conn.execute(f"CREATE TABLE {quote_identifier(table)} ({', '.join(definitions)})")
+    else:
+        if any(column in kinds and kinds[column] != kind for column, kind in existing.items()):
+            retype_table(conn, table, existing, kinds)
+        for column in columns:
+            if column not in existing:
+                conn.execute(
+                    f"ALTER TABLE {quote_identifier(table)} ADD COLUMN {quote_identifier(column)} {SQL_TYPES[kinds[column]]}"
+                )
+
+    for part in parts:
+        merge_part(conn, table, part, kinds)
+
+    all_columns = TAG_COLUMNS + columns
+    counts = conn.execute(
+        f"SELECT {', '.join(f'COUNT({quote_identifier(col)})' for col in all_columns)} FROM {quote_identifier(table)}"
+    ).fetchone()
+    with conn:
+        write_catalog(conn, table, all_columns, TAG_KINDS + [kinds[col] for col in columns], counts)
+        build_default_indexes(conn, table, find_key_columns(all_columns))
+        create_index(conn, table, "snapshot_date")
+    return conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+
+
+def table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+# Parse every sheet of every workbook in parallel worker processes, then merge the results into
+# RegisteredAdvisorsHistory / ExemptReportingAdvisersHistory tagged with source file, sheet and snapshot date.
+# Each merged table is recorded in Ingests, so cached answers keyed on the data version are not reused.
+def bulk_ingest(sources, db_path=HISTORY_DB_PATH, max_workers=None, progress=None):
+    start = time.perf_counter()
+    paths = expand_sources(sources)
+    work = [(path, sheet) for path in paths for sheet in list_sheets(path)]
+    part_dir = tempfile.mkdtemp(prefix="bulk_", dir=os.path.dirname(os.path.abspath(db_path)))
+    workers = max_workers or os.cpu_count() or 1
+    try:
+        parts = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for i, (path, sheet) in enumerate(work):
+                part_path = os.path.join(part_dir, f"part{i}.db")
+                futures[pool.submit(parse_sheet, path, sheet, part_path)] = (i, path, sheet, part_path)
+            for done, future in enumerate(as_completed(futures), 1):
+                i, path, sheet, part_path = futures[future]
+                stats = future.result()
+                if stats["rows"]:
+                    parts.append({
+                        "order": i,
+                        "path": part_path,
+                        "file_name": os.path.basename(path),
+                        "sheet": sheet,
+                        "snapshot_date": snapshot_date(path),
+                        "table": target_table(os.path.basename(path), sheet),
+                        "rows": stats["rows"],
+                    })
+                if progress:
+                    progress("parsing", done, len(work))
+        parts.sort(key=lambda part: part["order"])
+
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            tables = {}
+            for table in (REGISTERED_TABLE, EXEMPT_TABLE):
+                table_parts = [part for part in parts if part["table"] == table]
+                if table_parts:
+                    if progress:
+                        progress("merging", 0, len(table_parts))
+                    tables[table] = merge_table(conn, table, table_parts)
+                    rows = sum(part["rows"] for part in table_parts)
+                    with conn:
+                        create_bookkeeping_tables(conn)
+                        counts = {"added": rows, "updated": 0, "removed": 0, "unchanged": 0}
+                        log_ingest(conn, table, "bulk", rows, counts, [])
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    seconds = time.perf_counter() - start
+    rows = sum(part["rows"] for part in parts)
+    return {
+        "files": len(paths),
+        "sheets": len(parts),
+        "rows": rows,
+        "tables": tables,
+        "workers": workers,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else float(rows),
+    }
+
+
+# Prompt lines describing the history tables for Part 2, or "" when nothing has been bulk loaded
+def describe_history(db_path=HISTORY_DB_PATH):
+    if not os.path.exists(db_path):
+        return ""
+    conn = sqlite3.connect(db_path)
+    try:
+        lines = []
+        for table in (REGISTERED_TABLE, EXEMPT_TABLE):
+            if not table_exists(conn, table):
+                continue
+            rows, snapshots, first, last = conn.execute(
+                f"SELECT COUNT(*), COUNT(DISTINCT snapshot_date), MIN(snapshot_date), MAX(snapshot_date) "
+                f"FROM {quote_identifier(table)}"
+            ).fetchone()
+            lines.append(f"{HISTORY_SCHEMA}.{table}: {rows:,} rows, {snapshots} snapshots from {first} to {last}")
+    finally:
+        conn.close()
+    return "\n".join(lines)
@@ -0,0 +1,488 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+
+import numpy as np
+
+from schema import NUMERIC_INTEGER, NUMERIC_REAL, YES_NO, load_catalog, quote_identifier
+
+SIDECAR_SUFFIX = ".columns"
+META_FILE = "meta.json"
+CHUNK_ROWS = 5000
+COLUMN_KINDS = (NUMERIC_INTEGER, NUMERIC_REAL, YES_NO)
+
+_loaded = {}
+
+
+# Raised when a query falls outside the subset the vectorized engine understands
+class Unsupported(Exception):
+    pass
+
+
+def sidecar_dir(db_path):
+    return db_path + SIDECAR_SUFFIX
+
+
+def latest_ingest_id(conn):
+    try:
+        return conn.execute("SELECT MAX(ingest_id) FROM Ingests").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+# Write one memory-mappable .npy array per numeric and Y/N column. Numbers are float64 with NaN for NULL,
+# Y/N answers int8 with -1 for NULL. The directory is built aside and swapped in when complete.
+def build_sidecar(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        catalog = load_catalog(conn, table)
+        columns = [col for col, kind in catalog.items() if kind in COLUMN_KINDS]
+        rows = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+        target = sidecar_dir(db_path)
+        building = target + ".building"
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+
+        arrays = []
+        meta_columns = {}
+        for i, column in enumerate(columns):
+            kind = catalog[column]
+            dtype = np.int8 if kind == YES_NO else np.float64
+            file_name = f"c{i}.npy"
+            arrays.append(np.lib.format.open_memmap(os.path.join(building, file_name), mode="w+", dtype=dtype,
+                                                    shape=(rows,)))
+            meta_columns[column] = {"file": file_name, "kind": kind}
+
+        if columns:
+            null = [-1 if catalog[column] == YES_NO else np.nan for column in columns]
+            column_sql = ", ".join(quote_identifier(col) for col in columns)
+            cursor = conn.execute(f"SELECT {column_sql} FROM {quote_identifier(table)} ORDER BY rowid")
+            offset = 0
+            while True:
+                chunk = cursor.fetchmany(CHUNK_ROWS)
+                if not chunk:
+                    break
+                for i, values in enumerate(zip(*chunk)):
+                    arrays[i][offset:offset + len(chunk)] = [null[i] if v is None else v for v in values]
+                offset += len(chunk)
+        for array in arrays:
+            array.flush()
+        del arrays
+
+        with open(os.path.join(building, META_FILE), "w") as f:
+            json.dump({"table": table, "rows": rows, "ingest_id": latest_ingest_id(conn), "columns": meta_columns}, f)
+    finally:
+        conn.close()
+
+    old = target + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(target):
+        os.rename(target, old)
+    os.rename(building, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+# Keep a sidecar next to its database when the database file is renamed
+def move_sidecar(old_db_path, new_db_path):
+    source, target = sidecar_dir(old_db_path), sidecar_dir(new_db_path)
+    if os.path.exists(source):
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(source, target)
+
+
+def remove_sidecar(db_path):
+    shutil.rmtree(sidecar_dir(db_path), ignore_errors=True)
+
+
+# Open (memory-mapped, read-only) the sidecar for a database, reusing it across calls.
+# Worker processes mapping the same files share the operating system's page cache.
+def load_sidecar(db_path):
+    path = os.path.join(sidecar_dir(db_path), META_FILE)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _loaded.get(db_path)
+    if cached and cached["stamp"] == stamp:
+        return cached
+    with open(path) as f:
+        meta = json.load(f)
+    base = sidecar_dir(db_path)
+    cached = {
+        "stamp": stamp,
+        "meta": meta,
+        "arrays": {col: np.load(os.path.join(base, info["file"]), mmap_mode="r") for col, info in meta["columns"].items()},
+    }
+    _loaded[db_path] = cached
+    return cached
+
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<number>\d+\.\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?|\d+(?:[eE][+-]?\d+)?)
+      | (?P<quoted>"(?:[^"]|"")*")
+      | (?P<string>'(?:[^']|'')*')
+      | (?P<word>[A-Za-z_][A-Za-z0-9_.]*)
+      | (?P<op><=|>=|<>|!=|==|[-+*/=<>(),;])
+    )""",
+    re.VERBOSE,
+)
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if not match or match.end() == position:
+            raise Unsupported(query[position:])
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "word":
+            tokens.append(("word", value.upper()))
+        elif kind == "quoted":
+            tokens.append(("column", value[1:-1].replace('""', '"')))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+# Vector of row values with SQLite semantics: `values` is float64 (NaN for NULL), `is_int` tracks integer typing
+class RowVector:
+    def __init__(self, values, is_int):
+        self.values = values
+        self.is_int = is_int
+
+
+# Recursive-descent evaluator for the aggregate queries the Part 2 prompt produces:
+#   SELECT <scalar expr over SUM/AVG/COUNT/MIN/MAX and numbers> [AS name] FROM table [WHERE <condition>]
+# where aggregates take arithmetic over columns, and conditions combine numeric comparisons,
+# IS [NOT] NULL and IN lists with AND/OR/NOT using SQL three-valued logic.
+class Evaluator:
+    def __init__(self, tokens, sidecar, table):
+        self.tokens = tokens
+        self.pos = 0
+        self.meta = sidecar["meta"]
+        self.arrays = sidecar["arrays"]
+        self.table = table
+        self.rows = self.meta["rows"]
+        self.mask = None
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.pos += 1
+            return token
+        return None
+
+    def expect(self, kind, value=None):
+        token = self.accept(kind, value)
+        if token is None:
+            raise Unsupported(f"expected {value or kind}")
+        return token
+
+    def expect_table(self):
+        token = self.accept("word") or self.accept("column")
+        if token is None or token[1].upper() != self.table.upper():
+            raise Unsupported("unknown table")
+
+    def all_rows(self):
+        return np.ones(self.rows, dtype=bool)
+
+    def count(self, mask):
+        return int(mask.sum())
+
+    def evaluate(self):
+        self.expect("word", "SELECT")
+        start = self.pos
+        depth = 0
+        # Skip to the outer FROM so the WHERE mask is known before aggregates run
+        while True:
+            kind, value = self.peek()
+            if kind is None:
+                raise Unsupported("no FROM")
+            if kind == "op" and value == "(":
+                depth += 1
+            elif kind == "op" and value == ")":
+                depth -= 1
+            elif kind == "word" and value == "FROM" and depth == 0:
+                break
+            self.pos += 1
+        end = self.pos
+        self.pos += 1
+        self.expect_table()
+        if self.accept("word", "WHERE"):
+            truth, known = self.condition()
+            self.mask = truth & known
+        else:
+            self.mask = self.all_rows()
+        self.accept("op", ";")
+        if self.peek()[0] is not None:
+            raise Unsupported("trailing clauses")
+
+        self.tokens = self.tokens[:end]
+        self.pos = start
+        result = self.scalar_expr()
+        if self.accept("word", "AS"):
+            if not (self.accept("word") or self.accept("column") or self.accept("string")):
+                raise Unsupported("alias")
+        if self.peek()[0] is not None:
+            raise Unsupported("multiple result columns")
+        return result
+
+    # Scalar (post-aggregation) arithmetic, following SQLite's integer division and NULL rules
+    def scalar_expr(self):
+        value = self.scalar_term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            other = self.scalar_term()
+            value = None if value is None or other is None else (value + other if op == "+" else value - other)
+        return value
+
+    def scalar_term(self):
+        value = self.scalar_factor()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            other = self.scalar_factor()
+            if value is None or other is None:
+                value = None
+            elif op == "*":
+                value = value * other
+            elif other == 0:
+                value = None
+            elif isinstance(value, int) and isinstance(other, int):
+                value = int(value / other)
+            else:
+                value = value / other
+        return value
+
+    def scalar_factor(self):
+        if self.accept("op", "-"):
+            value = self.scalar_factor()
+            return None if value is None else -value
+        token = self.accept("number")
+        if token:
+            return number_literal(token[1])
+        if self.accept("op", "("):
+            if self.peek() == ("word", "SELECT"):
+                value = self.subquery_count()
+            else:
+                value = self.scalar_expr()
+            self.expect("op", ")")
+            return value
+        kind, name = self.peek()
+        if kind == "word" and name in ("SUM", "AVG", "COUNT", "MIN", "MAX", "TOTAL"):
+            self.pos += 1
+            return self.aggregate(name)
+        if kind == "word" and name == "CAST":
+            raise Unsupported("CAST")
+        raise Unsupported(f"unexpected {name}")
+
+    # (SELECT COUNT(*) FROM table) as used for fractions
+    def subquery_count(self):
+        self.expect("word", "SELECT")
+        self.expect("word", "COUNT")
+        self.expect("op", "(")
+        self.expect("op", "*")
+        self.expect("op", ")")
+        self.expect("word", "FROM")
+        self.expect_table()
+        return int(self.rows)
+
+    def aggregate(self, name):
+        self.expect("op", "(")
+        if name == "COUNT" and self.accept("op", "*"):
+            self.expect("op", ")")
+            return self.count(self.mask)
+        if self.accept("word", "DISTINCT"):
+            raise Unsupported("DISTINCT")
+        vector = self.row_expr()
+        self.expect("op", ")")
+        values = vector.values[self.mask]
+        values = values[~np.isnan(values)]
+        if name == "COUNT":
+            return int(values.size)
+        if name == "TOTAL":
+            return float(values.sum())
+        if values.size == 0:
+            return None
+        if name == "SUM":
+            total = values.sum()
+            return int(total) if vector.is_int else float(total)
+        if name == "AVG":
+            return float(values.mean())
+        extreme = values.min() if name == "MIN" else values.max()
+        return int(extreme) if vector.is_int else float(extreme)
+
+    # Row-wise arithmetic over columns; NULL in any operand makes the row NULL
+    def row_expr(self):
+        vector = self.row_term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            other = self.row_term()
+            values = vector.values + other.values if op == "+" else vector.values - other.values
+            vector = RowVector(values, vector.is_int and other.is_int)
+        return vector
+
+    def row_term(self):
+        vector = self.row_factor()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            other = self.row_factor()
+            if op == "*":
+                vector = RowVector(vector.values * other.values, vector.is_int and other.is_int)
+            else:
+                if vector.is_int and other.is_int:
+                    raise Unsupported("integer division")
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    values = vector.values / other.values
+                values[other.values == 0] = np.nan
+                vector = RowVector(values, False)
+        return vector
+
+    def row_factor(self):
+        if self.accept("op", "-"):
+            vector = self.row_factor()
+            return RowVector(-vector.values, vector.is_int)
+        token = self.accept("number")
+        if token:
+            value = number_literal(token[1])
+            return RowVector(np.full(self.rows, float(value)), isinstance(value, int))
+        token = self.accept("column")
+        if token:
+            return self.column(token[1])
+        if self.accept("op", "("):
+            vector = self.row_expr()
+            self.expect("op", ")")
+            return vector
+        # COALESCE(a, b, ...): the first non-NULL operand of each row, as used for blank-as-zero row sums
+        if self.accept("word", "COALESCE"):
+            self.expect("op", "(")
+            vector = self.row_expr()
+            while self.accept("op", ","):
+                other = self.row_expr()
+                values = np.where(np.isnan(vector.values), other.values, vector.values)
+                vector = RowVector(values, vector.is_int and other.is_int)
+            self.expect("op", ")")
+            return vector
+        raise Unsupported(f"unexpected {self.peek()[1]}")
+
+    def column(self, name):
+        info = self.meta["columns"].get(name)
+        if info is None:
+            raise Unsupported(f"column {name} is not in the columnar store")
+        array = self.arrays[name]
+        if info["kind"] == YES_NO:
+            values = array.astype(np.float64)
+            values[array < 0] = np.nan
+            return RowVector(values, True)
+        return RowVector(np.asarray(array), info["kind"] == NUMERIC_INTEGER)
+
+    # Conditions return (truth, known) boolean arrays so NULL comparisons behave as in SQL
+    def condition(self):
+        truth, known = self.and_condition()
+        while self.accept("word", "OR"):
+            other_truth, other_known = self.and_condition()
+            known = (known & other_known) | (truth & known) | (other_truth & other_known)
+            truth = truth | other_truth
+        return truth, known
+
+    def and_condition(self):
+        truth, known = self.not_condition()
+        while self.accept("word", "AND"):
+            other_truth, other_known = self.not_condition()
+            known = (known & other_known) | (known & ~truth) | (other_known & ~other_truth)
+            truth = truth & other_truth
+        return truth, known
+
+    def not_condition(self):
+        if self.accept("word", "NOT"):
+            truth, known = self.not_condition()
+            return known & ~truth, known
+        if self.peek() == ("op", "("):
+            saved = self.pos
+            self.pos += 1
+            try:
+                result = self.condition()
+                self.expect("op", ")")
+                return result
+            except Unsupported:
+                self.pos = saved
+        return self.comparison()
+
+    def comparison(self):
+        left = self.row_expr()
+        known_left = ~np.isnan(left.values)
+        if self.accept("word", "IS"):
+            negate = bool(self.accept("word", "NOT"))
+            self.expect("word", "NULL")
+            truth = known_left if negate else ~known_left
+            return truth, self.all_rows()
+        negate = bool(self.accept("word", "NOT"))
+        if self.accept("word", "IN"):
+            self.expect("op", "(")
+            values = [self.signed_number()]
+            while self.accept("op", ","):
+                values.append(self.signed_number())
+            self.expect("op", ")")
+            truth = np.isin(left.values, values) & known_left
+            return (known_left & ~truth if negate else truth), known_left
+        if negate:
+            raise Unsupported("NOT without IN")
+        kind, op = self.peek()
+        if kind != "op" or op not in ("=", "==", "!=", "<>", "<", ">", "<=", ">="):
+            raise Unsupported("comparison")
+        self.pos += 1
+        right = self.row_expr()
+        known = known_left & ~np.isnan(right.values)
+        with np.errstate(invalid="ignore"):
+            if op in ("=", "=="):
+                truth = left.values == right.values
+            elif op in ("!=", "<>"):
+                truth = left.values != right.values
+            elif op == "<":
+                truth = left.values < right.values
+            elif op == ">":
+                truth = left.values > right.values
+            elif op == "<=":
+                truth = left.values <= right.values
+            else:
+                truth = left.values >= right.values
+        return truth & known, known
+
+    def signed_number(self):
+        sign = -1 if self.accept("op", "-") else 1
+        return sign * float(self.expect("number")[1])
+
+
+def number_literal(text):
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    return float(text)
+
+
+# Answer a single-value aggregate query from the columnar sidecar.
+# Returns (True, value) when handled, (False, None) when the caller should fall back to SQLite.
+def try_aggregate(db_path, query, table, conn=None):
+    sidecar = load_sidecar(db_path)
+    if sidecar is None or sidecar["meta"]["table"] != table:
+        return False, None
+    if conn is not None and sidecar["meta"]["ingest_id"] != latest_ingest_id(conn):
+        return False, None
+    try:
+        return True, Evaluator(tokenize(query), sidecar, table).evaluate()
+    except Unsupported:
+        return False, None
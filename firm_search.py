@@ -0,0 +1,171 @@
+import re
+import sqlite3
+from difflib import SequenceMatcher
+
+from schema import find_key_columns, find_name_columns, quote_identifier
+from sql_resolver import FIRM_IGNORE_SCORE, FIRM_MATCH_SCORE, sql_literal
+
+FIRM_INDEX_TABLE = "FirmNames"
+MAX_CANDIDATES = 5
+
+# Words that start a question or are capitalised for other reasons, never part of a firm name on their own
+QUESTION_WORDS = {
+    "how", "what", "which", "who", "whose", "does", "do", "is", "are", "was", "list", "show", "give", "tell",
+    "find", "the", "a", "an", "of", "for", "in", "at", "form", "adv", "item", "sec",
+}
+# Legal suffixes that are ignored when comparing names
+NAME_SUFFIXES = {"co", "company", "corp", "corporation", "inc", "incorporated", "llc", "lp", "llp", "ltd", "limited",
+                 "l.l.c", "l.p", "plc"}
+FIRM_MENTION_PATTERN = re.compile(
+    r"\b([A-Z][\w&'.-]*(?:\s+(?:[A-Z0-9][\w&'.-]*|&|and|of|the))*)"
+)
+
+
+def normalize_name(name):
+    words = re.findall(r"[a-z0-9&]+", name.lower())
+    while words and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+# (Re)build the FTS5 trigram index over the firm name columns. Trigram tokens make substring and
+# misspelling-tolerant lookups cheap; older SQLite builds without the trigram tokenizer get word tokens.
+def build_firm_index(conn, table):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+    names = find_name_columns(columns)
+    conn.execute(f"DROP TABLE IF EXISTS {FIRM_INDEX_TABLE}")
+    if not names:
+        return 0
+    fts_columns = ", ".join(f"name{i}" for i in range(len(names)))
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE {FIRM_INDEX_TABLE} USING fts5({fts_columns}, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        conn.execute(f"CREATE VIRTUAL TABLE {FIRM_INDEX_TABLE} USING fts5({fts_columns})")
+    name_sql = ", ".join(quote_identifier(name) for name in names)
+    conn.execute(
+        f"INSERT INTO {FIRM_INDEX_TABLE} (rowid, {fts_columns}) SELECT rowid, {name_sql} FROM {quote_identifier(table)}"
+    )
+    return conn.execute(f"SELECT COUNT(*) FROM {FIRM_INDEX_TABLE}").fetchone()[0]
+
+
+# Capitalised word runs in a question that could be firm names ("American Investors Co"), longest first.
+# Each run also yields its tails, so "AUM of Smith Capital" still offers "Smith Capital".
+def firm_mentions(question):
+    mentions = re.findall(r"[\"“]([^\"”]{3,})[\"”]", question)
+    for match in FIRM_MENTION_PATTERN.finditer(question):
+        words = match.group(1).rstrip("?.,;:!").split()
+        while words and words[-1].lower() in ("and", "of", "the"):
+            words.pop()
+        for start in range(len(words)):
+            tail = words[start:]
+            if tail[0].lower() in QUESTION_WORDS or tail[0].lower() in ("and", "&"):
+                continue
+            if not all(word.lower() in QUESTION_WORDS for word in tail):
+                mentions.append(" ".join(tail))
+    return sorted(dict.fromkeys(m.strip() for m in mentions if len(m.strip()) >= 3), key=len, reverse=True)
+
+
+# FTS5 match expressions from strictest to loosest: the whole mention as a substring, all words, any word
+def fts_queries(mention):
+    words = [word for word in re.findall(r"[A-Za-z0-9&]+", mention) if len(word) >= 3]
+    phrase = " ".join(re.findall(r"[A-Za-z0-9&]+", mention))
+    queries = ['"' + phrase + '"'] if len(phrase) >= 3 else []
+    if words:
+        queries.append(" AND ".join(f'"{word}"' for word in words))
+        queries.append(" OR ".join(f'"{word}"' for word in words))
+    return list(dict.fromkeys(queries))
+
+
+# Rank advisers whose names match a free-text firm mention; returns up to `limit` candidates with their CRD
+def resolve_firm(conn, mention, table, limit=MAX_CANDIDATES):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+    names = find_name_columns(columns)
+    keys = find_key_columns(columns)
+    if not names:
+        return []
+    crd_column = columns[keys[0][1]] if keys else None
+    select_names = ", ".join(f"t.{quote_identifier(name)}" for name in names)
+    select_key = f"t.{quote_identifier(crd_column)}" if crd_column else "NULL"
+
+    rows = []
+    try:
+        for query in fts_queries(mention):
+            rows = conn.execute(
+                f"""SELECT t.rowid, {select_key}, {select_names}
+                    FROM {FIRM_INDEX_TABLE} f JOIN {quote_identifier(table)} t ON t.rowid = f.rowid
+                    WHERE {FIRM_INDEX_TABLE} MATCH ? ORDER BY bm25({FIRM_INDEX_TABLE}) LIMIT ?""",
+                (query, limit * 10),
+            ).fetchall()
+            if rows:
+                break
+    except sqlite3.OperationalError:
+        # No index yet (database ingested by an older version): fall back to an exact match on the names
+        where = " OR ".join(f"UPPER({quote_identifier(name)}) = UPPER(?)" for name in names)
+        rows = conn.execute(
+            f"SELECT t.rowid, {select_key}, {select_names} FROM {quote_identifier(table)} t WHERE {where} LIMIT ?",
+            [mention] * len(names) + [limit],
+        ).fetchall()
+
+    target = normalize_name(mention)
+    candidates = []
+    for row in rows:
+        row_names = [name for name in row[2:] if name]
+        score = max((SequenceMatcher(None, target, normalize_name(name)).ratio() for name in row_names), default=0.0)
+        candidates.append({
+            "row_id": row[0],
+            "crd": row[1],
+            "crd_column": crd_column,
+            "names": dict(zip(names, row[2:])),
+            "score": round(score, 3),
+        })
+    candidates.sort(key=lambda candidate: -candidate["score"])
+    return candidates[:limit]
+
+
+# A candidate is kept when its name is a close match, or a plausible one that contains every word of the
+# mention ("Smith Capital" for SMITH CAPITAL MANAGEMENT). Anything weaker, like "Texas", is no firm at all.
+def plausible_candidate(mention, candidate):
+    if candidate["score"] >= FIRM_MATCH_SCORE:
+        return True
+    if candidate["score"] < FIRM_IGNORE_SCORE:
+        return False
+    words = set(normalize_name(mention).split())
+    return any(words <= set(normalize_name(name).split()) for name in candidate["names"].values() if name)
+
+
+# Resolve the firm mentioned in a question: every candidate mention is looked up and the one whose
+# best match is closest wins, longer mentions breaking ties. Mentions with no plausible match resolve to nothing.
+def resolve_question_firms(db_path, question, table, limit=MAX_CANDIDATES):
+    best_mention, best = None, []
+    conn = sqlite3.connect(db_path)
+    try:
+        for mention in firm_mentions(question):
+            candidates = [candidate for candidate in resolve_firm(conn, mention, table, limit)
+                          if plausible_candidate(mention, candidate)]
+            if candidates and (not best or candidates[0]["score"] > best[0]["score"]):
+                best_mention, best = mention, candidates
+    finally:
+        conn.close()
+    return best_mention, best
+
+
+# WHERE term for one candidate: its CRD number, or its rowid when the data has no CRD for it
+def candidate_key(candidate):
+    if candidate["crd_column"] and candidate["crd"] is not None:
+        return f"{quote_identifier(candidate['crd_column'])} = {sql_literal(candidate['crd'])}"
+    return f"rowid = {candidate['row_id']}"
+
+
+# Prompt lines telling the SQL generator which advisers the firm mention resolved to
+def describe_firm_candidates(mention, candidates):
+    if not candidates:
+        return ""
+    lines = [f'The question mentions the firm "{mention}". Matching advisers, best match first:']
+    for candidate in candidates:
+        names = "; ".join(f"{column}: {name}" for column, name in candidate["names"].items() if name)
+        lines.append(f"- {candidate_key(candidate)} ({names}; match score {candidate['score']})")
+    lines.append(
+        f"Filter on the identifier of the best match (for example WHERE {candidate_key(candidates[0])}) "
+        "instead of guessing the exact business name."
+    )
+    return "\n".join(lines)
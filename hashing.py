@@ -0,0 +1,21 @@
+import hashlib
+import os
+
+HASH_BLOCK_BYTES = 1 << 20
+
+
+# SHA-256 of a path or an open binary file (an upload), read in blocks so large files are never held in memory.
+# A file object is read from the start and left at the position it was at.
+def file_sha256(source):
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    position = source.tell()
+    source.seek(0)
+    for block in iter(lambda: source.read(HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+    source.seek(position)
+    return digest.hexdigest()
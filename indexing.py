@@ -0,0 +1,167 @@
+import os
+import re
+import sqlite3
+import time
+from urllib.request import pathname2url
+
+from schema import quote_identifier
+
+QUERY_LOG_TABLE = "QueryLog"
+ADVICE_MIN_QUERIES = 3
+
+# Columns the generated SQL filters on most: firm names, custody flags, the small-entity items,
+# compensation and wrap fee answers, and the Item 5.D client counts
+DEFAULT_INDEX_PATTERNS = [
+    r"^Primary Business Name$",
+    r"^Legal Name$",
+    r"^9A\(1\)\([ab]\)$",
+    r"^9B\(1\)\([ab]\)$",
+    r"^12A$",
+    r"^12B\([12]\)$",
+    r"^12C\([12]\)$",
+    r"^5E\(\d\)$",
+    r"^5I\(\d\)",
+    r"^5D\([a-n]\)\(1\)$",
+]
+
+# Quoted column followed by a comparison, as written by the Part 2 prompt ("9A(1)(a)" = 1)
+PREDICATE_PATTERN = re.compile(
+    r'"((?:[^"]|"")+)"\s*(?:=|==|!=|<>|<=|>=|<|>|\bIN\b|\bLIKE\b|\bIS\b|\bBETWEEN\b)', re.IGNORECASE
+)
+
+
+def index_name(table, column):
+    return "idx_" + re.sub(r"\W+", "_", f"{table}_{column}").strip("_")
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+
+# Columns that already lead an index, so the advisor does not suggest duplicates
+def indexed_columns(conn, table):
+    columns = set()
+    for index in conn.execute(f"PRAGMA index_list({quote_identifier(table)})").fetchall():
+        info = conn.execute(f"PRAGMA index_info({quote_identifier(index[1])})").fetchall()
+        if info:
+            columns.add(info[0][2])
+    return columns
+
+
+def create_index(conn, table, column):
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name(table, column))} "
+        f"ON {quote_identifier(table)} ({quote_identifier(column)})"
+    )
+
+
+# Index the name, key and commonly filtered columns right after ingest
+def build_default_indexes(conn, table, key_columns=()):
+    columns = table_columns(conn, table)
+    wanted = [columns[position] for _, position in key_columns]
+    wanted += [col for col in columns if any(re.search(pattern, col) for pattern in DEFAULT_INDEX_PATTERNS)]
+    for column in dict.fromkeys(wanted):
+        create_index(conn, table, column)
+    conn.execute(f"ANALYZE {quote_identifier(table)}")
+    return list(dict.fromkeys(wanted))
+
+
+def create_query_log(conn):
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {QUERY_LOG_TABLE} (
+            executed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            query TEXT NOT NULL,
+            plan TEXT NOT NULL,
+            full_scan INTEGER NOT NULL,
+            seconds REAL
+        )"""
+    )
+
+
+# EXPLAIN QUERY PLAN details for a query, and whether it scans the table without an index
+def explain(conn, query, table):
+    details = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+    scan = re.compile(rf"^SCAN (TABLE )?{re.escape(table)}\b")
+    full_scan = any(scan.match(detail) and "INDEX" not in detail for detail in details)
+    return details, full_scan
+
+
+def read_only_uri(db_path):
+    return f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+
+
+# Connection that cannot write to the database, for running generated SQL. It never opens a transaction, so
+# no read lock outlives the statement that took it. `attached` maps schema names to further databases that are
+# attached read-only when they exist ({"history": "AdviserHistory.db"}).
+def connect_read_only(db_path, attached=None):
+    conn = sqlite3.connect(read_only_uri(db_path), uri=True, isolation_level=None)
+    for schema, path in (attached or {}).items():
+        if os.path.exists(path):
+            conn.execute(f"ATTACH DATABASE ? AS {quote_identifier(schema)}", (read_only_uri(path),))
+    return conn
+
+
+# Path of the database file a connection has open as "main"
+def database_path(conn):
+    return next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+
+
+# Run a query, logging its plan and timing for the index advisor. The log row is written and committed on a
+# connection of its own, so whatever the query itself changed is never committed here.
+def execute_logged(conn, query, table):
+    details, full_scan = explain(conn, query, table)
+    start = time.perf_counter()
+    cursor = conn.execute(query)
+    result = cursor.fetchone()
+    # Finish the statement so its read lock does not block the log write
+    cursor.close()
+    seconds = time.perf_counter() - start
+    try:
+        log_conn = sqlite3.connect(database_path(conn))
+        try:
+            create_query_log(log_conn)
+            log_conn.execute(
+                f"INSERT INTO {QUERY_LOG_TABLE} (query, plan, full_scan, seconds) VALUES (?, ?, ?, ?)",
+                (query, "\n".join(details), int(full_scan), seconds),
+            )
+            log_conn.commit()
+        finally:
+            log_conn.close()
+    except sqlite3.OperationalError:
+        # The log is best effort: a read-only or busy database must not fail the query
+        pass
+    return result
+
+
+# Columns that keep appearing in predicates of full-scan queries and have no index yet
+def advise_indexes(conn, table, min_queries=ADVICE_MIN_QUERIES):
+    try:
+        queries = [row[0] for row in conn.execute(f"SELECT query FROM {QUERY_LOG_TABLE} WHERE full_scan = 1")]
+    except sqlite3.OperationalError:
+        return []
+    existing = set(table_columns(conn, table))
+    indexed = indexed_columns(conn, table)
+    counts = {}
+    for query in queries:
+        where = re.split(r"\bWHERE\b", query, maxsplit=1, flags=re.IGNORECASE)
+        if len(where) < 2:
+            continue
+        for column in set(match.replace('""', '"') for match in PREDICATE_PATTERN.findall(where[1])):
+            if column in existing and column not in indexed:
+                counts[column] = counts.get(column, 0) + 1
+    return sorted(
+        ((column, count) for column, count in counts.items() if count >= min_queries),
+        key=lambda item: -item[1],
+    )
+
+
+# Create the advised indexes; returns the columns that were indexed
+def apply_index_advice(conn, table, min_queries=ADVICE_MIN_QUERIES):
+    advice = advise_indexes(conn, table, min_queries)
+    try:
+        for column, _ in advice:
+            create_index(conn, table, column)
+        conn.commit()
+    except sqlite3.OperationalError:
+        return []
+    return [column for column, _ in advice]
@@ -0,0 +1,395 @@
+import hashlib
+import sqlite3
+import time
+from datetime import date, datetime, time as dt_time
+
+from openpyxl import load_workbook
+
+from aggregates import build_summaries, summaries_exist
+from bitmap_index import build_bitmaps
+from columnar import build_sidecar
+from firm_search import build_firm_index
+from indexing import build_default_indexes
+from schema import (
+    ColumnStats, SQL_TYPES, build_converters, convert_chunk, find_key_columns, load_catalog, quote_identifier,
+    write_catalog,
+)
+from schema_digest import load_digest
+
+DB_PATH = "UserUploadedData.db"
+TABLE_NAME = "RegisteredAdvisors"
+CHUNK_ROWS = 2000
+
+# Bump whenever the layout of ingested databases changes so cached imports are rebuilt
+SCHEMA_VERSION = 8
+
+# Bookkeeping tables for incremental ingestion
+ROW_HASH_TABLE = "RowHashes"
+INGEST_LOG_TABLE = "Ingests"
+CHANGE_LOG_TABLE = "IngestChanges"
+CHANGE_LOG_KEEP = 12
+
+
+class EmptySheetError(ValueError):
+    pass
+
+
+# Pragmas for a one-shot bulk load: the table is rebuilt from the workbook if anything fails
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+]
+
+
+# Turn the header row into unique column names, matching the names pandas.read_excel produced
+def normalize_columns(header):
+    columns = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+# Convert an openpyxl cell value into something sqlite3 can bind
+def to_sql_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, str):
+        value = value.strip()
+        return value if value else None
+    return value
+
+
+# Open the worksheet in read-only mode and return its columns plus a generator of row chunks.
+# Only one chunk of rows is held in memory at a time; the workbook is closed once the chunks are consumed.
+# `progress(stage, rows_done, rows_total)` is called after every chunk; it may raise to cancel the import.
+def read_excel_chunks(source, sheet_name=None, chunk_rows=CHUNK_ROWS, progress=None):
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+    # The sheet dimension is only an estimate (it may count trailing blank rows)
+    total_rows = worksheet.max_row - 1 if worksheet.max_row else None
+    rows = worksheet.iter_rows(values_only=True)
+    columns = normalize_columns(next(rows, ()))
+    if not columns:
+        workbook.close()
+        raise EmptySheetError(f"Sheet {worksheet.title!r} has no header row")
+    width = len(columns)
+
+    def chunks():
+        try:
+            rows_done = 0
+            chunk = []
+            for row in rows:
+                if row is None or all(value is None for value in row):
+                    continue
+                values = [to_sql_value(value) for value in row[:width]]
+                values.extend([None] * (width - len(values)))
+                chunk.append(values)
+                if len(chunk) >= chunk_rows:
+                    rows_done += len(chunk)
+                    if progress:
+                        progress("reading", rows_done, total_rows)
+                    yield chunk
+                    chunk = []
+            if chunk:
+                rows_done += len(chunk)
+                if progress:
+                    progress("reading", rows_done, total_rows)
+                yield chunk
+        finally:
+            workbook.close()
+
+    return columns, chunks()
+
+
+# Create a table whose columns carry the given SQLite types (untyped when no types are given)
+def create_table(conn, table, columns, sql_types=None):
+    if sql_types is None:
+        column_sql = ", ".join(quote_identifier(col) for col in columns)
+    else:
+        column_sql = ", ".join(f"{quote_identifier(col)} {sql_type}" for col, sql_type in zip(columns, sql_types))
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+    conn.execute(f"CREATE TABLE {quote_identifier(table)} ({column_sql})")
+
+
+# Insert rows chunk by chunk with executemany; returns the number of rows written
+def insert_chunks(conn, table, columns, chunks):
+    column_sql = ", ".join(quote_identifier(col) for col in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    insert_sql = f"INSERT INTO {quote_identifier(table)} ({column_sql}) VALUES ({placeholders})"
+    rows_written = 0
+    for chunk in chunks:
+        conn.executemany(insert_sql, chunk)
+        rows_written += len(chunk)
+    return rows_written
+
+
+# Read a table back in chunks without materialising it
+def select_chunks(conn, table, columns, chunk_rows=CHUNK_ROWS):
+    column_sql = ", ".join(quote_identifier(col) for col in columns)
+    cursor = conn.execute(f"SELECT {column_sql} FROM {quote_identifier(table)} ORDER BY rowid")
+    while True:
+        chunk = cursor.fetchmany(chunk_rows)
+        if not chunk:
+            break
+        yield chunk
+
+
+# Stable content hash of a typed row
+def row_hash(row):
+    return hashlib.blake2b(repr(row).encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Adviser key for a row: CRD if present, else SEC file number, else the row content itself.
+# Keys repeated within one file are suffixed so every row keeps its own identity.
+def row_key(row, key_columns, digest, seen):
+    key = None
+    for label, position in key_columns:
+        if row[position] is not None:
+            key = f"{label}:{row[position]}"
+            break
+    if key is None:
+        key = f"row:{digest}"
+    base, n = key, 1
+    while key in seen:
+        n += 1
+        key = f"{base}#{n}"
+    seen.add(key)
+    return key
+
+
+# Row hashes per adviser key, one row per ingest, and the per-adviser changes of recent ingests
+def create_bookkeeping_tables(conn):
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {ROW_HASH_TABLE} (
+            table_name TEXT NOT NULL,
+            adviser_key TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_hash TEXT NOT NULL,
+            PRIMARY KEY (table_name, adviser_key)
+        )"""
+    )
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {INGEST_LOG_TABLE} (
+            ingest_id INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            ingested_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            mode TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            added INTEGER NOT NULL,
+            updated INTEGER NOT NULL,
+            removed INTEGER NOT NULL,
+            unchanged INTEGER NOT NULL
+        )"""
+    )
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+            ingest_id INTEGER NOT NULL,
+            adviser_key TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            change TEXT NOT NULL
+        )"""
+    )
+
+
+# Rebuild the typed table from staging, assigning row ids and recording every row's hash.
+# `progress("typing", rows_done, rows_total)` follows every chunk, so a cancelled import stops here too.
+def rebuild_table(conn, table, staging, columns, kinds, key_columns, chunk_rows, rows_total=None, progress=None):
+    converters = build_converters(kinds)
+    create_table(conn, table, columns, [SQL_TYPES[kind] for kind in kinds])
+    conn.execute(f"DELETE FROM {ROW_HASH_TABLE} WHERE table_name = ?", (table,))
+    column_sql = ", ".join(quote_identifier(col) for col in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    insert_sql = f"INSERT INTO {quote_identifier(table)} (rowid, {column_sql}) VALUES (?, {placeholders})"
+
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    seen = set()
+    row_id = 0
+    for chunk in select_chunks(conn, staging, columns, chunk_rows):
+        rows, hashes = [], []
+        for row in convert_chunk(chunk, converters):
+            row_id += 1
+            digest = row_hash(row)
+            key = row_key(row, key_columns, digest, seen)
+            rows.append([row_id] + row)
+            hashes.append((table, key, row_id, digest))
+        conn.executemany(insert_sql, rows)
+        conn.executemany(f"INSERT INTO {ROW_HASH_TABLE} VALUES (?, ?, ?, ?)", hashes)
+        if progress:
+            progress("typing", row_id, rows_total)
+    counts["added"] = row_id
+    return counts, []
+
+
+# Apply only what changed since the last snapshot: insert new advisers, rewrite rows whose
+# content hash differs and delete advisers that disappeared from the file. Reports progress like rebuild_table.
+def apply_delta(conn, table, staging, columns, kinds, key_columns, chunk_rows, rows_total=None, progress=None):
+    converters = build_converters(kinds)
+    known = {
+        key: (row_id, digest)
+        for key, row_id, digest in conn.execute(
+            f"SELECT adviser_key, row_id, row_hash FROM {ROW_HASH_TABLE} WHERE table_name = ?", (table,)
+        )
+    }
+    next_row_id = (conn.execute(f"SELECT MAX(rowid) FROM {quote_identifier(table)}").fetchone()[0] or 0) + 1
+    column_sql = ", ".join(quote_identifier(col) for col in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    assignments = ", ".join(f"{quote_identifier(col)} = ?" for col in columns)
+    insert_sql = f"INSERT INTO {quote_identifier(table)} (rowid, {column_sql}) VALUES (?, {placeholders})"
+    update_sql = f"UPDATE {quote_identifier(table)} SET {assignments} WHERE rowid = ?"
+    upsert_hash_sql = f"INSERT OR REPLACE INTO {ROW_HASH_TABLE} VALUES (?, ?, ?, ?)"
+
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    changes = []
+    seen = set()
+    rows_done = 0
+    for chunk in select_chunks(conn, staging, columns, chunk_rows):
+        inserts, updates, hashes = [], [], []
+        for row in convert_chunk(chunk, converters):
+            digest = row_hash(row)
+            key = row_key(row, key_columns, digest, seen)
+            previous = known.get(key)
+            if previous is None:
+                inserts.append([next_row_id] + row)
+                hashes.append((table, key, next_row_id, digest))
+                changes.append((key, next_row_id, "added"))
+                next_row_id += 1
+            elif previous[1] != digest:
+                updates.append(row + [previous[0]])
+                hashes.append((table, key, previous[0], digest))
+                changes.append((key, previous[0], "updated"))
+            else:
+                counts["unchanged"] += 1
+        conn.executemany(insert_sql, inserts)
+        conn.executemany(update_sql, updates)
+        conn.executemany(upsert_hash_sql, hashes)
+        counts["added"] += len(inserts)
+        counts["updated"] += len(updates)
+        rows_done += len(chunk)
+        if progress:
+            progress("typing", rows_done, rows_total)
+
+    removed = [(key, row_id) for key, (row_id, _) in known.items() if key not in seen]
+    conn.executemany(f"DELETE FROM {quote_identifier(table)} WHERE rowid = ?", [(row_id,) for _, row_id in removed])
+    conn.executemany(
+        f"DELETE FROM {ROW_HASH_TABLE} WHERE table_name = ? AND adviser_key = ?", [(table, key) for key, _ in removed]
+    )
+    changes.extend((key, row_id, "removed") for key, row_id in removed)
+    counts["removed"] = len(removed)
+    return counts, changes
+
+
+# Record the ingest and its per-adviser change log, keeping only the most recent ingests
+def log_ingest(conn, table, mode, rows, counts, changes):
+    cursor = conn.execute(
+        f"""INSERT INTO {INGEST_LOG_TABLE} (table_name, mode, rows, added, updated, removed, unchanged)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (table, mode, rows, counts["added"], counts["updated"], counts["removed"], counts["unchanged"]),
+    )
+    ingest_id = cursor.lastrowid
+    if mode == "delta":
+        conn.executemany(
+            f"INSERT INTO {CHANGE_LOG_TABLE} VALUES (?, ?, ?, ?)",
+            [(ingest_id, key, row_id, change) for key, row_id, change in changes],
+        )
+    conn.execute(
+        f"""DELETE FROM {CHANGE_LOG_TABLE} WHERE ingest_id NOT IN
+            (SELECT ingest_id FROM {INGEST_LOG_TABLE} ORDER BY ingest_id DESC LIMIT ?)""",
+        (CHANGE_LOG_KEEP,),
+    )
+    return ingest_id
+
+
+# Load the streamed rows into a raw staging table while collecting column statistics, then either
+# upsert the changes into the existing table (same columns and types, keyed by CRD / SEC number)
+# or rebuild it with inferred types. Everything happens inside one transaction.
+# With derived=False only the table and its catalog are written (no summaries or indexes).
+def write_chunks(conn, table, columns, chunks, chunk_rows=CHUNK_ROWS, incremental=True, progress=None, derived=True):
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    staging = f"_staging_{table}"
+    stats = ColumnStats(columns)
+
+    def observed(chunks):
+        for chunk in chunks:
+            stats.observe(chunk)
+            yield chunk
+
+    conn.isolation_level = None
+    conn.execute("BEGIN")
+    try:
+        create_bookkeeping_tables(conn)
+        create_table(conn, staging, columns)
+        rows_written = insert_chunks(conn, staging, columns, observed(chunks))
+        if progress:
+            progress("writing", rows_written, rows_written)
+
+        kinds = stats.infer()
+        key_columns = find_key_columns(columns)
+        same_layout = list(load_catalog(conn, table).items()) == list(zip(columns, kinds))
+        has_hashes = conn.execute(
+            f"SELECT 1 FROM {ROW_HASH_TABLE} WHERE table_name = ? LIMIT 1", (table,)
+        ).fetchone() is not None
+        if incremental and key_columns and same_layout and has_hashes:
+            mode = "delta"
+            if derived and not summaries_exist(conn):
+                build_summaries(conn, table)
+            # Summary tables follow the upserts through their triggers
+            counts, changes = apply_delta(conn, table, staging, columns, kinds, key_columns, chunk_rows,
+                                          rows_written, progress)
+        else:
+            mode = "full"
+            counts, changes = rebuild_table(conn, table, staging, columns, kinds, key_columns, chunk_rows,
+                                            rows_written, progress)
+            if derived:
+                build_summaries(conn, table)
+        conn.execute(f"DROP TABLE {quote_identifier(staging)}")
+        if derived:
+            build_default_indexes(conn, table, key_columns)
+            build_firm_index(conn, table)
+        write_catalog(conn, table, columns, kinds, stats.non_null)
+        ingest_id = log_ingest(conn, table, mode, rows_written, counts, changes)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return {"rows": rows_written, "kinds": kinds, "mode": mode, "ingest_id": ingest_id, **counts}
+
+
+# Stream an Excel workbook into SQLite and report how fast it went
+def ingest_excel(source, db_path=DB_PATH, table=TABLE_NAME, sheet_name=None, chunk_rows=CHUNK_ROWS, incremental=True,
+                 progress=None, derived=True):
+    start = time.perf_counter()
+    columns, chunks = read_excel_chunks(source, sheet_name=sheet_name, chunk_rows=chunk_rows, progress=progress)
+    conn = sqlite3.connect(db_path)
+    try:
+        result = write_chunks(conn, table, columns, chunks, chunk_rows, incremental, progress, derived)
+    finally:
+        chunks.close()
+        conn.close()
+    if derived:
+        if progress:
+            progress("columnar", result["rows"], result["rows"])
+        build_sidecar(db_path, table)
+        build_bitmaps(db_path)
+        load_digest(db_path, table)
+    seconds = time.perf_counter() - start
+    kinds = result.pop("kinds")
+    rows = result["rows"]
+    return {
+        **result,
+        "columns": len(columns),
+        "column_kinds": {kind: kinds.count(kind) for kind in set(kinds)},
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else float(rows),
+    }
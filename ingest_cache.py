@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from columnar import move_sidecar, remove_sidecar
+from hashing import file_sha256
+from ingest import DB_PATH, SCHEMA_VERSION, TABLE_NAME, ingest_excel
+
+CACHE_DIR = "ingest_cache"
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.db")
+MANIFEST_KEEP = 6
+
+
+def connect_manifest():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(MANIFEST_PATH, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS Manifest (
+            sha256 TEXT PRIMARY KEY,
+            db_path TEXT NOT NULL,
+            file_name TEXT,
+            size_bytes INTEGER,
+            rows INTEGER NOT NULL,
+            columns INTEGER NOT NULL,
+            ingest_mode TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            schema_version INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_used_at REAL NOT NULL
+        )"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS ActiveDatabase (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            sha256 TEXT NOT NULL,
+            db_path TEXT NOT NULL
+        )"""
+    )
+    return conn
+
+
+def set_active(conn, sha256, db_path):
+    conn.execute("INSERT OR REPLACE INTO ActiveDatabase VALUES (1, ?, ?)", (sha256, db_path))
+    conn.execute("UPDATE Manifest SET last_used_at = ? WHERE sha256 = ?", (time.time(), sha256))
+
+
+# The database the app should query: the most recently attached upload, or the legacy path
+def active_db_path():
+    if not os.path.exists(MANIFEST_PATH):
+        return DB_PATH
+    conn = connect_manifest()
+    try:
+        row = conn.execute("SELECT db_path FROM ActiveDatabase WHERE id = 1").fetchone()
+    finally:
+        conn.close()
+    return row[0] if row and os.path.exists(row[0]) else DB_PATH
+
+
+# Manifest entry for the active database, for display in the UI
+def active_entry():
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    conn = connect_manifest()
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute(
+            "SELECT m.* FROM Manifest m JOIN ActiveDatabase a ON a.sha256 = m.sha256"
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+# Drop the least recently used snapshot databases beyond MANIFEST_KEEP (never the active one)
+def prune_manifest(conn):
+    active = conn.execute("SELECT sha256 FROM ActiveDatabase WHERE id = 1").fetchone()
+    stale = conn.execute(
+        "SELECT sha256, db_path FROM Manifest WHERE sha256 != ? ORDER BY last_used_at DESC LIMIT -1 OFFSET ?",
+        (active[0] if active else "", MANIFEST_KEEP - 1),
+    ).fetchall()
+    for sha256, db_path in stale:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        remove_sidecar(db_path)
+        conn.execute("DELETE FROM Manifest WHERE sha256 = ?", (sha256,))
+
+
+# Import an uploaded workbook unless identical content was already imported.
+# A new snapshot starts from a copy of the active database, so the delta ingest only rewrites changed advisers;
+# it is built under a temporary name and renamed into place once complete.
+def ingest_cached(source, file_name=None, table=TABLE_NAME, progress=None):
+    sha256 = file_sha256(source)
+    conn = connect_manifest()
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute(
+            "SELECT * FROM Manifest WHERE sha256 = ? AND schema_version = ?", (sha256, SCHEMA_VERSION)
+        ).fetchone()
+        if row is not None and os.path.exists(row["db_path"]):
+            with conn:
+                set_active(conn, sha256, row["db_path"])
+            return {**dict(row), "cached": True}
+
+        db_path = os.path.join(CACHE_DIR, f"{sha256}.db")
+        fd, building_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".building")
+        os.close(fd)
+        try:
+            base_path = active_db_path()
+            if os.path.exists(base_path):
+                base = sqlite3.connect(base_path)
+                target = sqlite3.connect(building_path)
+                try:
+                    base.backup(target)
+                finally:
+                    target.close()
+                    base.close()
+
+            if hasattr(source, "seek"):
+                source.seek(0)
+            stats = ingest_excel(source, building_path, table, progress=progress)
+            move_sidecar(building_path, db_path)
+            os.replace(building_path, db_path)
+        except Exception:
+            if os.path.exists(building_path):
+                os.remove(building_path)
+            remove_sidecar(building_path)
+            raise
+
+        size_bytes = getattr(source, "size", None)
+        if isinstance(source, (str, os.PathLike)):
+            file_name = file_name or os.path.basename(source)
+            size_bytes = os.path.getsize(source)
+        entry = {
+            "sha256": sha256,
+            "db_path": db_path,
+            "file_name": file_name or getattr(source, "name", None),
+            "size_bytes": size_bytes,
+            "rows": stats["rows"],
+            "columns": stats["columns"],
+            "ingest_mode": stats["mode"],
+            "seconds": stats["seconds"],
+            "schema_version": SCHEMA_VERSION,
+        }
+        with conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO Manifest
+                    (sha256, db_path, file_name, size_bytes, rows, columns, ingest_mode, seconds, schema_version, last_used_at)
+                    VALUES (:sha256, :db_path, :file_name, :size_bytes, :rows, :columns, :ingest_mode, :seconds,
+                            :schema_version, 0)""",
+                entry,
+            )
+            set_active(conn, sha256, db_path)
+            prune_manifest(conn)
+    finally:
+        conn.close()
+    return {**entry, **stats, "cached": False}
@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from hashing import file_sha256
+from ingest_cache import CACHE_DIR, ingest_cached
+
+MAX_WORKERS = 1
+JOBS_KEEP = 20
+# Share of the whole import each stage takes, in order, so the progress bar and ETA run once from 0 to 100%
+# even though every stage counts its rows from 0
+STAGE_WEIGHTS = [("reading", 0.6), ("writing", 0.05), ("typing", 0.3), ("columnar", 0.05)]
+
+# Module-level so jobs survive Streamlit reruns (imported modules are not re-executed)
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ingest")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+# State of one background import, polled by the UI
+class IngestJob:
+    def __init__(self, job_id, sha256, file_name):
+        self.job_id = job_id
+        self.sha256 = sha256
+        self.file_name = file_name
+        self.status = "queued"
+        self.stage = None
+        self.rows_done = 0
+        self.rows_total = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+
+    def progress(self, stage, rows_done, rows_total):
+        if self.cancel_event.is_set():
+            raise IngestCancelled()
+        if stage != self.stage:
+            self.rows_total = None
+        self.stage = stage
+        self.rows_done = rows_done
+        if rows_total:
+            self.rows_total = max(rows_total, rows_done)
+
+    def percent(self):
+        if self.status == "done":
+            return 1.0
+        stages = [stage for stage, _ in STAGE_WEIGHTS]
+        if self.stage not in stages:
+            return 0.0
+        position = stages.index(self.stage)
+        done = sum(weight for _, weight in STAGE_WEIGHTS[:position])
+        fraction = min(self.rows_done / self.rows_total, 1.0) if self.rows_total else 0.0
+        # Full only once the job is done; the last stage reports its rows as it starts
+        return min(done + STAGE_WEIGHTS[position][1] * fraction, 0.99)
+
+    # Seconds left, extrapolated from the overall progress so far
+    def eta(self):
+        percent = self.percent()
+        if self.status != "running" or not percent or self.started_at is None:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed / percent * (1.0 - percent)
+
+    def is_active(self):
+        return self.status in ("queued", "running")
+
+
+def run_job(job, path):
+    if job.cancel_event.is_set():
+        job.status = "cancelled"
+        os.remove(path)
+        return
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        job.result = ingest_cached(path, job.file_name, progress=job.progress)
+        job.status = "done"
+    except IngestCancelled:
+        job.status = "cancelled"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        os.remove(path)
+
+
+def prune_jobs():
+    finished = sorted((job for job in _jobs.values() if not job.is_active()), key=lambda job: job.submitted_at)
+    for job in finished[:max(len(_jobs) - JOBS_KEEP, 0)]:
+        del _jobs[job.job_id]
+
+
+# Queue an uploaded workbook for import and return its job id. The upload is spooled to disk first so the
+# worker does not depend on the request's file object. An identical upload already in progress is reused.
+def submit_ingest(uploaded_file, file_name=None):
+    file_name = file_name or getattr(uploaded_file, "name", None)
+    sha256 = file_sha256(uploaded_file)
+    with _lock:
+        for job in _jobs.values():
+            if job.sha256 == sha256 and job.is_active():
+                return job.job_id
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".xlsx")
+        with os.fdopen(fd, "wb") as f:
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, f)
+        uploaded_file.seek(0)
+        job = IngestJob(uuid.uuid4().hex, sha256, file_name)
+        _jobs[job.job_id] = job
+        prune_jobs()
+    _executor.submit(run_job, job, path)
+    return job.job_id
+
+
+def get_job(job_id):
+    return _jobs.get(job_id)
+
+
+# Ask a job to stop; it rolls back at its next chunk and the active database is left untouched
+def cancel_job(job_id):
+    job = _jobs.get(job_id)
+    if job is not None and job.is_active():
+        job.cancel_event.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+    return job
@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, OpenAI, RateLimitError
+
+# Seconds allowed per call for each stage; Part 1 carries the largest prompt
+STAGE_TIMEOUTS = {"part1": 90.0, "sql": 45.0, "final": 45.0, "fast": 90.0}
+DEFAULT_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 5.0
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+# Requests in flight across every session of this process
+MAX_IN_FLIGHT = int(os.getenv("OPENAI_MAX_IN_FLIGHT", "8"))
+POOL_CONNECTIONS = MAX_IN_FLIGHT * 2
+
+# Module-level so the client and its connection pool survive Streamlit reruns (imported modules are not re-executed)
+_client = None
+_client_lock = threading.Lock()
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
+
+# The process-wide client. OPENAI_BASE_URL points it at any OpenAI-compatible server, such as a local mock.
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=POOL_CONNECTIONS, max_keepalive_connections=POOL_CONNECTIONS),
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+            _client = OpenAI(
+                api_key=os.getenv("OAI") or os.getenv("OPENAI_API_KEY"),
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                http_client=http_client,
+                max_retries=0,
+            )
+        return _client
+
+
+def retryable(error):
+    if isinstance(error, (RateLimitError, APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+# Full-jitter exponential backoff, never shorter than a Retry-After the server asked for
+def backoff_seconds(attempt, error):
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+def create_with_retries(stage, **request):
+    timeout = STAGE_TIMEOUTS.get(stage, DEFAULT_TIMEOUT)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return get_client().chat.completions.create(timeout=timeout, **request)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not retryable(e):
+                raise
+            time.sleep(backoff_seconds(attempt, e))
+
+
+# One chat completion for `stage`, holding an in-flight slot for the duration of the call
+def chat(stage, model, messages):
+    with _in_flight:
+        completion = create_with_retries(stage, model=model, messages=messages)
+    return completion.choices[0].message.content
+
+
+# One chat completion constrained to a JSON schema (structured outputs), parsed into a dict
+def chat_json(stage, model, messages, name, schema):
+    response_format = {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+    with _in_flight:
+        completion = create_with_retries(stage, model=model, messages=messages, response_format=response_format)
+    return json.loads(completion.choices[0].message.content)
+
+
+# Streamed chat completion yielding text deltas. Only opening the stream is retried; once tokens have been
+# shown a failure is raised rather than replayed. The in-flight slot is held until the stream is consumed.
+def stream_chat(stage, model, messages):
+    with _in_flight:
+        stream = create_with_retries(stage, model=model, messages=messages, stream=True)
+        try:
+            for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    yield content
+        finally:
+            stream.close()
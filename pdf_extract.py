@@ -0,0 +1,165 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+import pytesseract
+from pdf2image import convert_from_path
+
+from hashing import file_sha256
+
+# Worker processes for OCR; 0 or unset means one per CPU
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+# Pages scheduled ahead of the one being returned; 0 or unset means twice the worker count
+OCR_WINDOW = int(os.getenv("OCR_WINDOW", "0"))
+OCR_LANG = "eng"
+# A page whose text layer has fewer characters than this is treated as an image and OCR'd
+MIN_TEXT_CHARS = 40
+
+PAGE_CACHE_DIR = "ocr_cache"
+PAGE_CACHE_PATH = os.path.join(PAGE_CACHE_DIR, "pages.db")
+
+_tesseract_version = None
+
+
+# Everything that changes extraction output; a cached page made with other settings is stale
+def ocr_settings(dpi=OCR_DPI, lang=OCR_LANG, min_text_chars=MIN_TEXT_CHARS):
+    global _tesseract_version
+    if _tesseract_version is None:
+        try:
+            _tesseract_version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            _tesseract_version = "unknown"
+    return json.dumps({
+        "engine": "tesseract", "version": _tesseract_version, "dpi": dpi, "lang": lang, "grayscale": True,
+        "min_text_chars": min_text_chars,
+    }, sort_keys=True)
+
+
+def connect_page_cache(path=PAGE_CACHE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS Documents (
+            sha256 TEXT PRIMARY KEY,
+            file_name TEXT,
+            pages INTEGER NOT NULL,
+            last_used_at REAL NOT NULL
+        )"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS Pages (
+            sha256 TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            settings TEXT NOT NULL,
+            text BLOB NOT NULL,
+            seconds REAL NOT NULL,
+            method TEXT NOT NULL DEFAULT 'ocr',
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sha256, page, settings)
+        )"""
+    )
+    if "method" not in [row[1] for row in conn.execute("PRAGMA table_info(Pages)")]:
+        conn.execute("ALTER TABLE Pages ADD COLUMN method TEXT NOT NULL DEFAULT 'ocr'")
+    return conn
+
+
+# Page texts already extracted for this document and settings, {page: (text, seconds, method)}
+def cached_pages(conn, sha256, settings):
+    rows = conn.execute(
+        "SELECT page, text, seconds, method FROM Pages WHERE sha256 = ? AND settings = ?", (sha256, settings)
+    )
+    return {page: (zlib.decompress(text).decode("utf-8"), seconds, method) for page, text, seconds, method in rows}
+
+
+def store_page(conn, sha256, settings, result):
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO Pages (sha256, page, settings, text, seconds, method) VALUES (?, ?, ?, ?, ?, ?)",
+            (sha256, result["page"], settings, zlib.compress(result["text"].encode("utf-8"), 9), result["seconds"],
+             result["method"]),
+        )
+
+
+# Worker process: rasterise and OCR a single page. Each worker renders its own page (grayscale, straight to
+# a temporary file) so only the path and page number cross the process boundary and at most one page image
+# per worker is alive at a time.
+def ocr_page(pdf_path, page_number, dpi=OCR_DPI, lang=OCR_LANG):
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="ocr_") as output_folder:
+        images = convert_from_path(
+            pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True,
+            output_folder=output_folder,
+        )
+        try:
+            text = pytesseract.image_to_string(images[0], lang=lang) if images else ""
+        finally:
+            for image in images:
+                image.close()
+    return {"page": page_number, "text": text, "seconds": time.perf_counter() - start, "method": "ocr"}
+
+
+# Embedded text of one page, stripped of blank lines as in the notebook, or None when the page has too
+# little text and is really a scanned image
+def text_layer_page(document, page_number, min_text_chars=MIN_TEXT_CHARS):
+    start = time.perf_counter()
+    text = document.load_page(page_number - 1).get_text("text")
+    text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+    if len(text) < min_text_chars:
+        return None
+    return {"page": page_number, "text": text, "seconds": time.perf_counter() - start, "method": "text"}
+
+
+# Yield the text of every page of a PDF in page order, as soon as each page is ready. Pages already in the
+# on-disk cache for this file's hash and settings are read back. The rest are read from the embedded text
+# layer, and only pages without usable text are rasterised and OCR'd across a process pool. Work is scheduled
+# at most `window` pages ahead of the page being yielded, so memory stays bounded however long the filing is.
+# Each result is cached as soon as it is yielded.
+def iter_pages(pdf_path, max_workers=None, window=None, dpi=OCR_DPI, cache_path=PAGE_CACHE_PATH):
+    sha256 = file_sha256(pdf_path)
+    settings = ocr_settings(dpi)
+    workers = max_workers or OCR_WORKERS or os.cpu_count() or 1
+    window = window or OCR_WINDOW or workers * 2
+    conn = connect_page_cache(cache_path)
+    document = pymupdf.open(pdf_path)
+    pool = None
+    try:
+        pages = document.page_count
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO Documents (sha256, file_name, pages, last_used_at) VALUES (?, ?, ?, ?)",
+                (sha256, os.path.basename(pdf_path), pages, time.time()),
+            )
+        cached = cached_pages(conn, sha256, settings)
+        ready, pending = {}, {}
+        scheduled = 0
+        for page_number in range(1, pages + 1):
+            while scheduled < min(pages, page_number + window - 1):
+                scheduled += 1
+                if scheduled in cached:
+                    text, seconds, method = cached.pop(scheduled)
+                    ready[scheduled] = {"page": scheduled, "text": text, "seconds": seconds, "method": method,
+                                        "cached": True}
+                    continue
+                result = text_layer_page(document, scheduled)
+                if result is not None:
+                    ready[scheduled] = {**result, "cached": False}
+                    continue
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                pending[scheduled] = pool.submit(ocr_page, pdf_path, scheduled, dpi)
+            result = ready.pop(page_number, None) or {**pending.pop(page_number).result(), "cached": False}
+            if not result["cached"]:
+                store_page(conn, sha256, settings, result)
+            yield {**result, "pages": pages}
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        document.close()
+        conn.close()
+
@@ -0,0 +1,170 @@
+import math
+import os
+import re
+from collections import Counter
+
+from sections import load_sections, normalize_reference, section_text
+from vector_index import VECTOR_DIR, load_index
+
+# Approximate prompt budget for the retrieved document text, and how many sections may be sent
+PART1_TOKEN_BUDGET = int(os.getenv("PART1_TOKEN_BUDGET", "1500"))
+PART1_TOP_K = int(os.getenv("PART1_TOP_K", "6"))
+# Below this BM25 score the question shares too little with the form to trust retrieval
+MIN_SCORE = 1.0
+CHARS_PER_TOKEN = 4
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion constant for merging the BM25 and embedding rankings
+RRF_K = 60
+FORM_VECTOR_DIR = os.path.join(VECTOR_DIR, "form_adv")
+
+STOPWORDS = {
+    "a", "about", "all", "an", "and", "any", "are", "as", "at", "be", "by", "do", "does", "for", "from", "have", "how",
+    "if", "in", "is", "it", "many", "much", "of", "on", "or", "our", "that", "the", "their", "them", "there", "this",
+    "to", "was", "what", "which", "who", "with", "you", "your",
+}
+ITEM_REFERENCE_PATTERN = re.compile(r"\b(?:Item\s+\d{1,2}(?:\.\s*[A-Z])?|\d{1,2}\.[A-Z]\.?(?:\s*\(\d{1,2}\))?)", re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# Lowercased word terms with stopwords dropped and plural "s" stripped, so "advisers" matches "adviser"
+def terms(text):
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in words if word not in STOPWORDS]
+
+
+# Okapi BM25 over a fixed list of chunks ({"id", "text", ...}), built once and queried per question
+class BM25Index:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.frequencies = [Counter(terms(chunk["text"])) for chunk in chunks]
+        self.lengths = [sum(frequency.values()) for frequency in self.frequencies]
+        self.average_length = sum(self.lengths) / len(self.lengths) if chunks else 0.0
+        document_frequency = Counter(term for frequency in self.frequencies for term in frequency)
+        self.idf = {
+            term: math.log(1 + (len(chunks) - count + 0.5) / (count + 0.5)) for term, count in document_frequency.items()
+        }
+
+    def scores(self, query):
+        query_terms = [term for term in set(terms(query)) if term in self.idf]
+        results = []
+        for i, frequency in enumerate(self.frequencies):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / (self.average_length or 1))
+            for term in query_terms:
+                tf = frequency.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def search(self, query, k):
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: -scores[i])
+        return [(scores[i], self.chunks[i]) for i in ranked[:k] if scores[i] > 0]
+
+
+# One chunk per lettered sub-item (with its numbered children), plus one for each Item's own introduction,
+# each prefixed with the Item's title so "custody" finds every part of Item 9
+def section_chunks(sections):
+    chunks = []
+    for node_id, node in sections.items():
+        if node["parent"] is not None:
+            continue
+        heading = f"Item {node_id}: {node['title']}" if node["title"] else f"Item {node_id}"
+        if not node["children"] or node["text"]:
+            text = section_text(sections, node_id) if not node["children"] else f"{heading}: {node['text']}"
+            chunks.append({"id": node_id, "text": text, "pages": node["pages"], "order": len(chunks)})
+        for child in node["children"]:
+            chunks.append({
+                "id": child,
+                "text": f"{heading}\n{section_text(sections, child)}",
+                "pages": sections[child]["pages"],
+                "order": len(chunks),
+            })
+    return chunks
+
+
+# Fallback chunks when no section index is available: one per page of the extracted text
+def page_chunks(pages):
+    return [{"id": f"page {page['page']}", "text": page["text"], "pages": [page["page"], page["page"]], "order": i}
+            for i, page in enumerate(pages)]
+
+
+_index = {}
+
+
+def section_index():
+    try:
+        sections = load_sections()
+    except (OSError, ValueError):
+        return None
+    if _index.get("sections") is not sections:
+        chunks = section_chunks(sections)
+        vectors = load_index(FORM_VECTOR_DIR)
+        stored = {item["id"]: item["text"] for item in vectors.meta["items"]}
+        changed = [chunk for chunk in chunks if stored.get(chunk["id"]) != chunk["text"]]
+        vectors.add([chunk["id"] for chunk in changed], [chunk["text"] for chunk in changed])
+        _index.update(sections=sections, index=BM25Index(chunks), vectors=vectors)
+    return _index["index"]
+
+
+# Merge the lexical and embedding rankings by reciprocal rank so a section either one ranks highly is kept
+def fuse_rankings(*rankings):
+    scores, chunks = {}, {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking):
+            scores[chunk["id"]] = scores.get(chunk["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+            chunks[chunk["id"]] = chunk
+    return [chunks[chunk_id] for chunk_id in sorted(scores, key=lambda chunk_id: -scores[chunk_id])]
+
+
+# The part of the document to send with a Part 1 question: the best BM25 chunks that fit in the token
+# budget, in document order. Sections named in the question ("Item 9.A") are always included first.
+# Falls back to the full text when retrieval has nothing convincing to offer.
+def select_context(question, full_text, pages=None, token_budget=PART1_TOKEN_BUDGET, top_k=PART1_TOP_K):
+    index = section_index()
+    if index is None and pages:
+        index = BM25Index(page_chunks(pages))
+    full_tokens = estimate_tokens(full_text)
+    fallback = {"text": full_text, "sections": [], "tokens": full_tokens, "full_tokens": full_tokens, "retrieved": False}
+    if index is None or not index.chunks:
+        return fallback
+
+    by_id = {chunk["id"]: chunk for chunk in index.chunks}
+    named = []
+    for reference in ITEM_REFERENCE_PATTERN.findall(question):
+        node_id = normalize_reference(reference)
+        named += [chunk for chunk_id, chunk in by_id.items()
+                  if node_id and (chunk_id == node_id or chunk_id.startswith(node_id + ".") or node_id.startswith(chunk_id + "."))]
+    ranked = index.search(question, top_k)
+    if not named and (not ranked or ranked[0][0] < MIN_SCORE):
+        return fallback
+    ranking = [chunk for _, chunk in ranked]
+    if index is _index.get("index"):
+        similar = [by_id[item["id"]] for _, item in _index["vectors"].search(question, top_k) if item["id"] in by_id]
+        # Each ranking holds up to top_k chunks, so the fused one is cut back to top_k
+        ranking = fuse_rankings(ranking, similar)[:top_k]
+
+    selected, tokens = [], 0
+    for chunk in named + ranking:
+        cost = estimate_tokens(chunk["text"])
+        if chunk in selected or (selected and tokens + cost > token_budget):
+            continue
+        # Named sections always go in; ranked ones only while fewer than top_k have been chosen
+        if chunk not in named and len(selected) >= top_k:
+            break
+        selected.append(chunk)
+        tokens += cost
+    selected.sort(key=lambda chunk: chunk["order"])
+    return {
+        "text": "\n\n".join(chunk["text"] for chunk in selected),
+        "sections": [chunk["id"] for chunk in selected],
+        "tokens": tokens,
+        "full_tokens": full_tokens,
+        "retrieved": True,
+    }
@@ -0,0 +1,241 @@
+import re
+import sqlite3
+from datetime import datetime
+
+CATALOG_TABLE = "ColumnCatalog"
+
+# Column kinds decided at ingest and the SQLite type each one is stored as
+NUMERIC_INTEGER = "integer"
+NUMERIC_REAL = "real"
+YES_NO = "yes_no"
+DATE = "date"
+TEXT = "text"
+
+SQL_TYPES = {
+    NUMERIC_INTEGER: "INTEGER",
+    NUMERIC_REAL: "REAL",
+    YES_NO: "INTEGER",
+    DATE: "TEXT",
+    TEXT: "TEXT",
+}
+
+YES_VALUES = {"y", "yes"}
+NO_VALUES = {"n", "no"}
+DATE_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%Y %H:%M:%S", "%m/%d/%y"]
+
+# Adviser identifiers used as the upsert key, in order of preference
+CRD_COLUMN_HINTS = ["crd"]
+SEC_COLUMN_HINTS = ["sec#", "sec number", "sec file number", "sec file #"]
+
+# Firm name columns, as in the SEC adviser files
+NAME_COLUMN_HINTS = ["primary business name", "legal name"]
+
+NUMBER_PATTERN = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+INT64_MAX = 2 ** 63 - 1
+
+
+# Quote a column or table name for use in SQL (Form ADV headers contain parentheses and spaces)
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# Find the CRD and SEC file number columns used to key advisers across snapshots
+def find_key_columns(columns):
+    keys = []
+    lowered = [col.strip().lower() for col in columns]
+    for label, hints in (("crd", CRD_COLUMN_HINTS), ("sec", SEC_COLUMN_HINTS)):
+        for i, name in enumerate(lowered):
+            if any(hint in name for hint in hints):
+                keys.append((label, i))
+                break
+    return keys
+
+
+# Primary business name and legal name columns, in that order
+def find_name_columns(columns):
+    names = []
+    lowered = [col.strip().lower() for col in columns]
+    for hint in NAME_COLUMN_HINTS:
+        for column, name in zip(columns, lowered):
+            if hint in name:
+                names.append(column)
+                break
+    return names
+
+
+# Parse a cell as a number, accepting thousands separators and a leading "$"; returns None if it is not one.
+# Strings with a leading zero (zip codes, identifiers) are left as text so the zero is not lost.
+def parse_number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip().replace(",", "").replace("$", "")
+    if not NUMBER_PATTERN.match(text):
+        return None
+    digits = text.lstrip("+-")
+    if len(digits) > 1 and digits[0] == "0" and digits[1] != ".":
+        return None
+    number = float(text)
+    if number.is_integer() and "." not in text and "e" not in text.lower() and abs(number) <= INT64_MAX:
+        return int(text)
+    return number
+
+
+# Parse a Y/N answer into 1/0; returns None if the cell is not a Y/N answer
+def parse_yes_no(value):
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    if text in YES_VALUES:
+        return 1
+    if text in NO_VALUES:
+        return 0
+    return None
+
+
+# Parse a date cell into an ISO string (time kept only when it is not midnight)
+def parse_date(value):
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if parsed.hour or parsed.minute or parsed.second:
+            return parsed.isoformat(sep=" ")
+        return parsed.date().isoformat()
+    return None
+
+
+# Running per-column counters, updated chunk by chunk so inference needs no second copy of the data
+class ColumnStats:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        width = len(self.columns)
+        self.non_null = [0] * width
+        self.numeric = [0] * width
+        self.integral = [0] * width
+        self.yes_no = [0] * width
+        self.dates = [0] * width
+
+    def observe(self, chunk):
+        for row in chunk:
+            for i, value in enumerate(row):
+                if value is None:
+                    continue
+                self.non_null[i] += 1
+                number = parse_number(value)
+                if number is not None:
+                    self.numeric[i] += 1
+                    if isinstance(number, int) or number.is_integer():
+                        self.integral[i] += 1
+                    continue
+                if parse_yes_no(value) is not None:
+                    self.yes_no[i] += 1
+                elif parse_date(value) is not None:
+                    self.dates[i] += 1
+
+    # A column gets a typed kind only if every non-null value fits it; anything mixed stays text
+    def infer(self):
+        kinds = []
+        for i in range(len(self.columns)):
+            total = self.non_null[i]
+            if total == 0:
+                kinds.append(TEXT)
+            elif self.yes_no[i] == total:
+                kinds.append(YES_NO)
+            elif self.numeric[i] == total:
+                kinds.append(NUMERIC_INTEGER if self.integral[i] == total else NUMERIC_REAL)
+            elif self.dates[i] == total:
+                kinds.append(DATE)
+            else:
+                kinds.append(TEXT)
+        return kinds
+
+
+# Build one converter per column so rows can be coerced with a single pass
+def build_converters(kinds):
+    def to_integer(value):
+        number = parse_number(value)
+        return int(number) if number is not None else None
+
+    def to_real(value):
+        number = parse_number(value)
+        return float(number) if number is not None else None
+
+    def to_text(value):
+        return value if value is None or isinstance(value, str) else str(value)
+
+    by_kind = {
+        NUMERIC_INTEGER: to_integer,
+        NUMERIC_REAL: to_real,
+        YES_NO: parse_yes_no,
+        DATE: parse_date,
+        TEXT: to_text,
+    }
+    return [by_kind[kind] for kind in kinds]
+
+
+# Coerce a chunk of raw rows into their inferred types
+def convert_chunk(chunk, converters):
+    return [
+        [None if value is None else convert(value) for convert, value in zip(converters, row)]
+        for row in chunk
+    ]
+
+
+# Record the type decisions so prompts and downstream engines know how each column is stored
+def write_catalog(conn, table, columns, kinds, non_null):
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+            table_name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            column_name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            sql_type TEXT NOT NULL,
+            non_null INTEGER NOT NULL,
+            PRIMARY KEY (table_name, column_name)
+        )"""
+    )
+    conn.execute(f"DELETE FROM {CATALOG_TABLE} WHERE table_name = ?", (table,))
+    conn.executemany(
+        f"INSERT INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (table, i, column, kind, SQL_TYPES[kind], non_null[i])
+            for i, (column, kind) in enumerate(zip(columns, kinds))
+        ],
+    )
+
+
+# Read back the column catalog as {column_name: kind}
+def load_catalog(conn, table):
+    try:
+        rows = conn.execute(
+            f"SELECT column_name, kind FROM {CATALOG_TABLE} WHERE table_name = ? ORDER BY position",
+            (table,),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return dict(rows)
+
+
+# Catalog rows with their non-null counts, for merging catalogs of several files
+def load_catalog_rows(conn, table):
+    return conn.execute(
+        f"SELECT column_name, kind, non_null FROM {CATALOG_TABLE} WHERE table_name = ? ORDER BY position", (table,)
+    ).fetchall()
+
+
+# Kind for a column that was inferred separately in several files: numbers widen to real, anything else mixed is text
+def merge_kinds(kinds):
+    kinds = set(kinds)
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds <= {NUMERIC_INTEGER, NUMERIC_REAL}:
+        return NUMERIC_REAL
+    return TEXT
@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+
+from aggregates import describe_summaries
+from columnar import latest_ingest_id
+from indexing import connect_read_only
+from retrieval import estimate_tokens, terms
+from schema import YES_NO, find_key_columns, find_name_columns, load_catalog_rows, quote_identifier
+from sql_resolver import expand_references, parse_references
+
+DIGEST_TABLE = "SchemaDigest"
+# Approximate prompt budget for the column list in the Part 2 prompt
+SCHEMA_TOKEN_BUDGET = int(os.getenv("SCHEMA_TOKEN_BUDGET", "1500"))
+SAMPLE_VALUES = 5
+SAMPLE_CHARS = 40
+
+_loaded = {}
+
+
+# One entry per column: inferred kind, fill count, distinct count, range and most common values
+def column_profile(conn, table, name, kind, non_null):
+    column = quote_identifier(name)
+    distinct, low, high = conn.execute(
+        f"SELECT COUNT(DISTINCT {column}), MIN({column}), MAX({column}) FROM {quote_identifier(table)}"
+    ).fetchone()
+    common = conn.execute(
+        f"""SELECT {column} FROM {quote_identifier(table)} WHERE {column} IS NOT NULL
+            GROUP BY {column} ORDER BY COUNT(*) DESC, {column} LIMIT ?""",
+        (SAMPLE_VALUES,),
+    ).fetchall()
+    samples = [value[:SAMPLE_CHARS] if isinstance(value, str) else value for (value,) in common]
+    return {"name": name, "kind": kind, "non_null": non_null, "distinct": distinct, "min": low, "max": high,
+            "samples": samples}
+
+
+# Profile every column of `table` in one pass over the catalog. Databases ingested before the catalog existed
+# get their columns from the table itself, with an unknown kind.
+def build_digest(conn, table):
+    try:
+        catalog = load_catalog_rows(conn, table)
+    except sqlite3.OperationalError:
+        catalog = []
+    if not catalog:
+        catalog = [(row[1], "unknown", None) for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+    return {
+        "table": table,
+        "ingest_id": latest_ingest_id(conn),
+        "rows": conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0],
+        "summaries": describe_summaries(conn),
+        "columns": [column_profile(conn, table, name, kind, non_null) for name, kind, non_null in catalog],
+    }
+
+
+# The digest for the database's current ingest, stored in the database itself so it is computed once per
+# version and travels with the file. Reused in-process until a new ingest is logged; query logging and index
+# advice also write to the file, so its modification time is no guide.
+def load_digest(db_path, table):
+    conn = connect_read_only(db_path)
+    try:
+        ingest_id = latest_ingest_id(conn)
+    finally:
+        conn.close()
+    cached = _loaded.get((db_path, table))
+    if cached and cached[0] == ingest_id:
+        return cached[1]
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {DIGEST_TABLE} (table_name TEXT PRIMARY KEY, ingest_id INTEGER, digest TEXT NOT NULL)"
+        )
+        row = conn.execute(f"SELECT ingest_id, digest FROM {DIGEST_TABLE} WHERE table_name = ?", (table,)).fetchone()
+        ingest_id = latest_ingest_id(conn)
+        if row is not None and row[0] == ingest_id:
+            digest = json.loads(row[1])
+        else:
+            digest = build_digest(conn, table)
+            with conn:
+                conn.execute(f"INSERT OR REPLACE INTO {DIGEST_TABLE} VALUES (?, ?, ?)",
+                             (table, ingest_id, json.dumps(digest, default=str)))
+    finally:
+        conn.close()
+    _loaded[(db_path, table)] = (ingest_id, digest)
+    return digest
+
+
+def column_line(profile):
+    parts = [f"{profile['name']} [{profile['kind']}]"]
+    if profile["kind"] == YES_NO:
+        parts.append("1 = Y, 0 = N")
+    elif profile["min"] is not None and profile["distinct"] > SAMPLE_VALUES and not isinstance(profile["min"], str):
+        parts.append(f"{profile['distinct']} distinct, {profile['min']} to {profile['max']}")
+    elif profile["distinct"] > SAMPLE_VALUES:
+        parts.append(f"{profile['distinct']} distinct")
+    if profile["non_null"] is not None:
+        parts.append(f"{profile['non_null']} filled")
+    if profile["kind"] != YES_NO:
+        parts.append(f"e.g. {profile['samples']}")
+    return "; ".join(parts)
+
+
+# Column list for the Part 2 prompt, pruned to `token_budget`: identifier and name columns first, then the
+# columns the Part 1 answer refers to, then columns whose names share words with the question and answer,
+# then the rest in table order while room remains
+def describe_schema(digest, question, part1_answer, token_budget=SCHEMA_TOKEN_BUDGET):
+    profiles = {profile["name"]: profile for profile in digest["columns"]}
+    names = list(profiles)
+    keys = [names[i] for _, i in find_key_columns(names)] + find_name_columns(names)
+    referenced = expand_references(
+        [(reference, False) for reference, _ in parse_references(part1_answer or "")], profiles
+    ) or []
+    words = {term for term in terms(f"{question} {part1_answer or ''}") if len(term) > 2 and term.isalpha()}
+    overlap = {name: len(words & set(terms(name))) for name in names}
+    named = sorted((name for name in names if overlap[name]), key=lambda name: -overlap[name])
+
+    required = set(keys + referenced)
+    selected, tokens = set(), 0
+    for name in dict.fromkeys(keys + referenced + named + names):
+        cost = estimate_tokens(column_line(profiles[name]))
+        if tokens + cost > token_budget and name not in required:
+            continue
+        selected.add(name)
+        tokens += cost
+    lines = [column_line(profiles[name]) for name in names if name in selected]
+    omitted = len(names) - len(selected)
+    if omitted:
+        lines.append(f"({omitted} further columns not shown; they follow the same Form ADV item naming, e.g. 5D(a)(1).)")
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+
+from hashing import file_sha256
+
+ELEMENTS_PATH = os.path.join("output", "refinedOutput.json")
+SECTIONS_PATH = os.path.join("output", "sections.json")
+
+ITEM_PATTERN = re.compile(r"^Item\s+(\d{1,2})(?![.\d])\s*(.*)$")
+SCHEDULE_PATTERN = re.compile(r"^SCHEDULE\s+([A-DR])\b\s*(.*)$", re.IGNORECASE)
+SCHEDULE_SECTION_PATTERN = re.compile(r"^Section\s+(\d{1,2})\.([A-Z])\.?\s*(.*)$")
+LETTER_PATTERN = re.compile(r"^([A-Z])\.\s+(.*)$", re.DOTALL)
+NUMBER_PATTERN = re.compile(r"^\((\d{1,2})\)\s*(.*)$", re.DOTALL)
+# Checkbox and page-number debris left by the PDF partitioner
+NOISE_PATTERN = re.compile(r"^(Yes|No|[oOgG0C1]{1,4}|NG|\d{1,3})$")
+SKIPPED_TYPES = {"Image", "Footer", "Header", "PageBreak"}
+
+# Item references as they appear in questions, answers and column names:
+# "Item 5.D", "5.D.", "9.A.(2)", "9A(2)", "5D(a)(1)", "Schedule D Section 7.B.(1)"
+REFERENCE_PATTERN = re.compile(
+    r"(?:Schedule\s+([A-DR])\b[\s,]*(?:Section\s+)?)?(?:Item\s+)?(\d{1,2})(?:\.?\s*([A-Z])(?![a-z]))?\.?\s*(?:\((\d{1,2})\))?",
+    re.IGNORECASE,
+)
+
+
+def section_id(item, letter=None, number=None, schedule=None):
+    parts = []
+    if item is not None:
+        parts.append(str(int(item)))
+        if letter:
+            parts.append(letter.upper())
+            if number:
+                parts.append(f"({int(number)})")
+    if schedule:
+        return " ".join([f"Schedule {schedule.upper()}"] + [".".join(parts)] * bool(parts))
+    return ".".join(parts)
+
+
+def parent_id(node_id):
+    if "." in node_id:
+        return node_id.rsplit(".", 1)[0]
+    if node_id.startswith("Schedule ") and node_id.count(" ") == 2:
+        return node_id.rsplit(" ", 1)[0]
+    return None
+
+
+# Canonical section id for a free-form reference, or None when it does not look like one
+def normalize_reference(reference):
+    match = REFERENCE_PATTERN.search(reference.strip())
+    if not match:
+        return None
+    schedule, item, letter, number = match.groups()
+    return section_id(item, letter, number, schedule)
+
+
+# Walk the partitioned elements in reading order and nest them into Item -> letter -> (number) sections.
+# A letter or number only opens a new section when it moves forward, so stray "O." or a repeated "(1)"
+# inside a table stays in the text of the section it belongs to.
+def build_sections(elements):
+    sections = {}
+    order = []
+    path = {"schedule": None, "item": None, "letter": None, "number": None}
+    current = None
+    awaiting_title = None
+
+    def open_section(node_id, title, page, parent):
+        node = sections.get(node_id)
+        if node is None:
+            node = {"id": node_id, "title": title, "parent": parent, "children": [], "pages": [page, page], "text": []}
+            sections[node_id] = node
+            order.append(node_id)
+            if parent is not None:
+                sections[parent]["children"].append(node_id)
+        return node
+
+    def add_text(node, text, page):
+        if node is None or not text:
+            return
+        node["text"].append(text)
+        while node is not None:
+            node["pages"][1] = max(node["pages"][1], page)
+            node = sections.get(node["parent"]) if node["parent"] else None
+
+    for element in elements:
+        if element.get("type") in SKIPPED_TYPES:
+            continue
+        text = " ".join(element.get("text", "").split())
+        page = element.get("metadata", {}).get("page_number")
+        if not text or NOISE_PATTERN.match(text):
+            continue
+
+        schedule = SCHEDULE_PATTERN.match(text)
+        if schedule and element.get("type") == "Title":
+            path = {"schedule": schedule.group(1).upper(), "item": None, "letter": None, "number": None}
+            current = open_section(section_id(None, schedule=path["schedule"]), schedule.group(2) or None, page, None)
+            awaiting_title = None if schedule.group(2) else current
+            continue
+
+        item = ITEM_PATTERN.match(text) or (SCHEDULE_SECTION_PATTERN.match(text) if path["schedule"] else None)
+        if item:
+            letter = item.group(2) if item.re is SCHEDULE_SECTION_PATTERN else None
+            title = item.groups()[-1]
+            parent = section_id(None, schedule=path["schedule"]) if path["schedule"] else None
+            path.update(item=int(item.group(1)), letter=None, number=None)
+            current = open_section(section_id(path["item"], schedule=path["schedule"]), title or None, page, parent)
+            if letter:
+                path["letter"] = letter
+                current = open_section(section_id(path["item"], letter, schedule=path["schedule"]), title or None,
+                                       page, current["id"])
+            awaiting_title = None if title else current
+            continue
+
+        if awaiting_title is not None and element.get("type") == "Title":
+            awaiting_title["title"] = text
+            awaiting_title = None
+            continue
+        awaiting_title = None
+
+        letter = LETTER_PATTERN.match(text) if path["item"] is not None else None
+        if letter and (path["letter"] is None or letter.group(1) > path["letter"]):
+            path.update(letter=letter.group(1), number=None)
+            text = letter.group(2)
+            current = open_section(section_id(path["item"], path["letter"], schedule=path["schedule"]),
+                                   None if NUMBER_PATTERN.match(text) else text[:120], page,
+                                   section_id(path["item"], schedule=path["schedule"]))
+        number = NUMBER_PATTERN.match(text) if path["letter"] is not None else None
+        if number and (path["number"] is None or int(number.group(1)) > path["number"]):
+            path["number"] = int(number.group(1))
+            current = open_section(section_id(path["item"], path["letter"], path["number"], path["schedule"]),
+                                   number.group(2)[:120], page,
+                                   section_id(path["item"], path["letter"], schedule=path["schedule"]))
+            text = number.group(2)
+        add_text(current, text, page)
+
+    for node in sections.values():
+        node["text"] = "\n".join(node["text"])
+    return {node_id: sections[node_id] for node_id in order}
+
+
+# Parse refinedOutput.json into output/sections.json, recording the source hash so stale artifacts are rebuilt
+def build_section_index(elements_path=ELEMENTS_PATH, sections_path=SECTIONS_PATH):
+    with open(elements_path, encoding="utf-8") as f:
+        elements = json.load(f)
+    index = {
+        "source": os.path.basename(elements_path),
+        "source_sha256": file_sha256(elements_path),
+        "sections": build_sections(elements),
+    }
+    building = sections_path + ".building"
+    with open(building, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(building, sections_path)
+    return index
+
+
+_loaded = {}
+
+
+# The section index, keyed by id ("5", "5.D", "9.A.(2)"), rebuilt when refinedOutput.json has changed
+def load_sections(elements_path=ELEMENTS_PATH, sections_path=SECTIONS_PATH):
+    stamp = (os.stat(elements_path).st_mtime_ns, os.stat(sections_path).st_mtime_ns if os.path.exists(sections_path) else None)
+    cached = _loaded.get(sections_path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    index = None
+    if stamp[1] is not None:
+        with open(sections_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("source_sha256") != file_sha256(elements_path):
+            index = None
+    if index is None:
+        index = build_section_index(elements_path, sections_path)
+        stamp = (stamp[0], os.stat(sections_path).st_mtime_ns)
+    sections = index["sections"]
+    _loaded[sections_path] = (stamp, sections)
+    return sections
+
+
+# Section for a reference like "Item 5.D" or "9A(1)(a)"; falls back to the nearest enclosing section
+# that exists (5D(a)(1) -> 5.D) and returns None when the item is unknown
+def find_section(sections, reference):
+    node_id = normalize_reference(reference)
+    while node_id:
+        if node_id in sections:
+            return sections[node_id]
+        node_id = parent_id(node_id)
+    return None
+
+
+# Text of a section and everything nested under it, headed by its id and title
+def section_text(sections, node_id):
+    node = sections[node_id]
+    heading = f"Item {node_id}" if node_id[0].isdigit() else node_id
+    if node["title"] and not node["text"].startswith(node["title"]):
+        heading = f"{heading}: {node['title']}"
+    lines = [f"{heading}: {node['text']}" if node["text"] else heading]
+    for child in node["children"]:
+        lines.append(section_text(sections, child))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    built = build_section_index()
+    print(f"Wrote {len(built['sections'])} sections to {SECTIONS_PATH}")
@@ -0,0 +1,331 @@
+import re
+import sqlite3
+
+from aggregates import FLAG_METRICS
+from indexing import connect_read_only
+from retrieval import terms
+from schema import NUMERIC_INTEGER, NUMERIC_REAL, YES_NO, load_catalog, quote_identifier
+from sections import find_section, load_sections, section_text
+
+# A firm match this close filters the query on the firm's CRD number; a weaker one that is still plausible
+# leaves the question to the LLM, and anything below is treated as no firm at all ("United States" scores
+# 0.62 against UNITED STATES COMMODITY FUNDS LLC)
+FIRM_MATCH_SCORE = 0.9
+FIRM_IGNORE_SCORE = 0.65
+# Ranges are only expanded when both ends are this close ("5D(a)(3) ... 5D(n)(3)" spans 14)
+MAX_RANGE = 30
+NUMERIC_KINDS = {NUMERIC_INTEGER, NUMERIC_REAL}
+# Authorizer actions a plain read needs; anything else (writes, ATTACH, PRAGMA, DDL) is refused while checking
+READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# Item references as columns are named: "5D(a)(3)", "Item 5.D.(a)(3)", "9.A.(1)(a)", "12B(1)"
+COLUMN_REFERENCE_PATTERN = re.compile(
+    r"(?<![\w.(])(\d{1,2})\.?\s?([A-Z])\.?((?:\.?\s?\([A-Za-z0-9]{1,2}\))*)(?![\w(])"
+)
+# What may sit between the two ends of a range: "5D(a)(3) to 5D(n)(3)", "5D(b)(3), ..., to 5D(n)(3)"
+RANGE_GAP_PATTERN = re.compile(r"(?:(?:\.\.\.|…)\s*)?(?:to|through|thru|-|–|—|\.\.\.|…)", re.IGNORECASE)
+
+FRACTION_PATTERN = re.compile(
+    r"\b(fraction|proportion|percentage|percent|share)\s+of\s+(?:\w+\s+){0,3}?(advis|firm|compan|registrant)"
+)
+PERCENT_PATTERN = re.compile(r"\bpercent(age)?\b")
+COUNT_PATTERN = re.compile(r"\b(how many|number of|count)\b")
+TOTAL_PATTERN = re.compile(r"\b(total|sum|combined|aggregate|overall)\b")
+AVERAGE_PATTERN = re.compile(r"\b(average|mean)\b")
+NEGATION_PATTERN = re.compile(r"\b(not|no|none|without|never|neither|nor)\b|n't\b")
+ALL_OF_PATTERN = re.compile(r"\b(both|all of|each of)\b")
+UNIT_PATTERN = re.compile(r"\bin\s+(?:\w+\s+)?(trillions?|billions?|millions?|thousands?)\b")
+UNITS = {"thousand": "1e3", "million": "1e6", "billion": "1e9", "trillion": "1e12"}
+NUMBER_WORDS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                "nine": 9, "ten": 10, "hundred": 100}
+SCALES = {"thousand": 1e3, "million": 1e6, "billion": 1e9, "trillion": 1e12}
+# Longer phrases first so "at least" is not read as "least"
+THRESHOLD_PATTERN = re.compile(
+    r"\b(more than|greater than|in excess of|exceeding|over|above|at least|fewer than|less than|under|below|at most)\s+"
+    r"(\$?\d[\d,]*(?:\.\d+)?|" + "|".join(NUMBER_WORDS) + r")\s*(%|percent\b)?(?:\s*(thousand|million|billion|trillion)\b)?"
+)
+# Words a question may use without narrowing down which advisers it is about: the population, the measure
+# asked for and its unit (after `terms`, so plurals are already stripped)
+FILLER_TERMS = {
+    "adviser", "advisor", "investment", "registered", "firm", "companie", "company", "registrant", "sec", "form", "adv",
+    "total", "number", "count", "fraction", "proportion", "percentage", "percent", "share", "average", "mean", "sum",
+    "combined", "aggregate", "overall", "amount", "under", "value", "each", "both", "every", "dollar", "thousand", "million",
+    "billion", "trillion", "aum", "raum", "has", "having", "can", "they", "these", "those", "there", "were", "will",
+    "would", "give", "tell", "show", "list", "find", "me", "please", "currently", "altogether", "approximately",
+}
+THRESHOLD_OPERATORS = {
+    "more than": ">", "greater than": ">", "in excess of": ">", "exceeding": ">", "over": ">", "above": ">",
+    "at least": ">=", "fewer than": "<", "less than": "<", "under": "<", "below": "<", "at most": "<=",
+}
+
+
+# ("5D", ["a", "3"]) for a column-style reference, or None
+def split_reference(reference):
+    match = re.fullmatch(r"(\d{1,2}[A-Z])((?:\([a-z0-9]{1,2}\))*)", reference)
+    if not match:
+        return None
+    return match.group(1), re.findall(r"\(([a-z0-9]{1,2})\)", match.group(2))
+
+
+def join_reference(base, parts):
+    return base + "".join(f"({part})" for part in parts)
+
+
+def column_reference(match):
+    parts = re.findall(r"\(([A-Za-z0-9]{1,2})\)", match.group(3))
+    return join_reference(f"{int(match.group(1))}{match.group(2)}", [part.lower() for part in parts])
+
+
+# Every reference between two ends that differ in exactly one part: 5D(a)(3) .. 5D(n)(3), or 6A(1) .. 6A(14)
+def expand_range(start, end):
+    first, last = split_reference(start), split_reference(end)
+    if not first or not last or first[0] != last[0] or len(first[1]) != len(last[1]):
+        return None
+    differing = [i for i, (a, b) in enumerate(zip(first[1], last[1])) if a != b]
+    if len(differing) != 1:
+        return None
+    i = differing[0]
+    a, b = first[1][i], last[1][i]
+    if a.isdigit() and b.isdigit():
+        values = [str(n) for n in range(int(a), int(b) + 1)]
+    elif len(a) == len(b) == 1 and a.isalpha() and b.isalpha():
+        values = [chr(n) for n in range(ord(a), ord(b) + 1)]
+    else:
+        return None
+    if not 1 < len(values) <= MAX_RANGE:
+        return None
+    return [join_reference(first[0], first[1][:i] + [value] + first[1][i + 1:]) for value in values]
+
+
+# Column-style references in the Part 1 answer, in order, with ranges spelled out. Returns (reference, required)
+# pairs; the members inside a range are not required, since the form may skip letters the data has no column for.
+def parse_references(text):
+    matches = list(COLUMN_REFERENCE_PATTERN.finditer(text))
+    references = {}
+    previous = None
+    for match in matches:
+        reference = column_reference(match)
+        if previous is not None:
+            gap = re.sub(r"[\s,]+", " ", text[previous.end():match.start()]).strip()
+            expanded = expand_range(column_reference(previous), reference) if RANGE_GAP_PATTERN.fullmatch(gap) else None
+            for member in (expanded or [])[1:-1]:
+                references.setdefault(member, False)
+        references[reference] = True
+        previous = match
+    return list(references.items())
+
+
+# Columns the references stand for: the column itself, or every sub-column of a broad reference
+# ("9A(1)" -> 9A(1)(a), 9A(1)(b)). Returns None when a required reference has no column in the data.
+def expand_references(references, catalog):
+    columns = []
+    for reference, required in references:
+        if reference in catalog:
+            columns.append(reference)
+            continue
+        children = [column for column in catalog if column.startswith(reference + "(")]
+        if not children and required:
+            return None
+        columns.extend(children)
+    return list(dict.fromkeys(columns))
+
+
+def parse_number(text, scale):
+    text = text.lstrip("$").replace(",", "")
+    value = float(NUMBER_WORDS[text]) if text in NUMBER_WORDS else float(text)
+    value *= SCALES.get(scale, 1.0)
+    return int(value) if value == int(value) else value
+
+
+# (operator, number) for "more than one million", "over 60%", "at least 100" in the question, or None
+def parse_threshold(question):
+    matches = THRESHOLD_PATTERN.findall(question)
+    if len(matches) != 1:
+        return None
+    phrase, number, _, scale = matches[0]
+    if number == "a" and not scale:
+        return None
+    return THRESHOLD_OPERATORS[phrase], parse_number(number, scale)
+
+
+# Content words of the question that neither the filler words nor `allowed` account for, once the `spans`
+# (threshold phrase, firm mention) are taken out. Anything left is a qualifier, like "based in Texas", that a
+# query built from the recognised parts alone would silently drop.
+def leftover_terms(question, allowed, spans=()):
+    text = question.lower()
+    for span in spans:
+        if span:
+            text = text.replace(span.lower(), " ")
+    return sorted({term for term in terms(text) if term.isalpha() and term not in FILLER_TERMS and term not in allowed})
+
+
+# Words that describe the columns: their names, the Form ADV text of the items they belong to and the titles
+# of the items above them ("Small Businesses" for 12A)
+def column_terms(columns):
+    words = {term for column in columns for term in terms(column)}
+    try:
+        sections = load_sections()
+    except OSError:
+        return words
+    nodes = [find_section(sections, column) for column in columns]
+    for node_id in {node["id"] for node in nodes if node}:
+        words.update(terms(section_text(sections, node_id)))
+        while sections[node_id]["parent"]:
+            node_id = sections[node_id]["parent"]
+            words.update(terms(sections[node_id]["title"] or ""))
+    return words
+
+
+# The condition for "advisers answering yes": the rule of a known summary flag with exactly these columns
+# ("none" for the small adviser test), otherwise any column answered Y, or every column with "both"/"all of".
+# None when the columns only partly cover an all-"N" test.
+def flag_condition(columns, question):
+    rule = next((metric[3] for metric in FLAG_METRICS if sorted(metric[2]) == sorted(columns)), None)
+    if rule is None and any(metric[3] == "none" and set(columns) & set(metric[2]) for metric in FLAG_METRICS):
+        return None
+    if rule is None:
+        rule = "all" if len(columns) > 1 and ALL_OF_PATTERN.search(question) else "any"
+    quoted = [quote_identifier(column) for column in columns]
+    if rule == "none":
+        return " AND ".join(f"{column} = 0" for column in quoted)
+    if rule == "all":
+        return " AND ".join(f"{column} = 1" for column in quoted)
+    return " OR ".join(f"{column} = 1" for column in quoted)
+
+
+# Per-adviser value of the columns: the column itself, or a blank-as-zero row sum of several
+def row_value(columns):
+    if len(columns) == 1:
+        return quote_identifier(columns[0])
+    return "(" + " + ".join(f"COALESCE({quote_identifier(column)}, 0)" for column in columns) + ")"
+
+
+def sql_literal(value):
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# WHERE term selecting the firm the question names, "" when it names none, or None when the match is too weak
+def firm_filter(firm_candidates):
+    if not firm_candidates or firm_candidates[0]["score"] < FIRM_IGNORE_SCORE:
+        return ""
+    best = firm_candidates[0]
+    if best["score"] < FIRM_MATCH_SCORE:
+        return None
+    if best["crd_column"] and best["crd"] is not None:
+        return f"{quote_identifier(best['crd_column'])} = {sql_literal(best['crd'])}"
+    return f"rowid = {best['row_id']}"
+
+
+# SQL for the question over the columns the Part 1 answer names. Returns (sql, intent), or (None, reason)
+# when the question is not one of the recognised shapes.
+def build_query(question, columns, kinds, table, firm):
+    question = question.lower()
+    if NEGATION_PATTERN.search(question):
+        return None, "the question is negated"
+    kind_classes = {"flag" if kinds[column] == YES_NO else "number" if kinds[column] in NUMERIC_KINDS else "other"
+                    for column in columns}
+    if len(kind_classes) != 1 or "other" in kind_classes:
+        return None, "the columns are not all numbers or all Y/N answers"
+    numeric = kind_classes == {"number"}
+    fraction = bool(FRACTION_PATTERN.search(question))
+    scale = " * 100.0" if fraction and PERCENT_PATTERN.search(question) else ""
+    unit = UNIT_PATTERN.search(question)
+    divisor = f" / {UNITS[unit.group(1).rstrip('s')]}" if unit else ""
+
+    if firm:
+        if numeric and len(columns) > 1 and TOTAL_PATTERN.search(question):
+            return f"SELECT {row_value(columns)}{divisor} AS total FROM {table} WHERE {firm}", "firm total"
+        # Only the first value of the result row reaches the answer, so several columns are left to the LLM
+        if len(columns) > 1:
+            return None, "several columns for one firm"
+        return f"SELECT {quote_identifier(columns[0])} FROM {table} WHERE {firm}", "firm value"
+
+    if numeric:
+        threshold = parse_threshold(question)
+        if threshold:
+            condition = f"{row_value(columns)} {threshold[0]} {threshold[1]}"
+            if fraction:
+                return (f"SELECT COUNT(*) * 1.0 / (SELECT COUNT(*) FROM {table}){scale} AS fraction FROM {table} "
+                        f"WHERE {condition}"), "fraction over threshold"
+            if COUNT_PATTERN.search(question):
+                return f"SELECT COUNT(*) AS advisers FROM {table} WHERE {condition}", "count over threshold"
+            return None, "a threshold without a count or fraction"
+        if AVERAGE_PATTERN.search(question):
+            return f"SELECT AVG({row_value(columns)}){divisor} AS average FROM {table}", "average"
+        if TOTAL_PATTERN.search(question):
+            total = " + ".join(f"TOTAL({quote_identifier(column)})" for column in columns)
+            if divisor and len(columns) > 1:
+                total = f"({total})"
+            return f"SELECT {total}{divisor} AS total FROM {table}", "total"
+        return None, "no total, average or threshold in the question"
+
+    condition = flag_condition(columns, question)
+    if condition is None:
+        return None, "the columns cover only part of the small adviser test"
+    if fraction:
+        return (f"SELECT COUNT(*) * 1.0 / (SELECT COUNT(*) FROM {table}){scale} AS fraction FROM {table} "
+                f"WHERE {condition}"), "fraction of advisers"
+    if COUNT_PATTERN.search(question) or TOTAL_PATTERN.search(question):
+        return f"SELECT COUNT(*) AS advisers FROM {table} WHERE {condition}", "count of advisers"
+    return None, "no count or fraction in the question"
+
+
+# Build the Part 2 query without the LLM when the Part 1 answer names columns that exist, the question is a
+# total, average, count or fraction, and it asks about nothing beyond those columns, a threshold and the firm.
+# Returns {"sql", "columns", "intent"} or None when not confident, with the reason in "reason" so the caller
+# can fall back to the LLM.
+def resolve_sql(question, part1_answer, db_path, table, firm_candidates=None, firm_mention=None):
+    if not part1_answer or re.search(r"\bSchedule\s+[A-DR]\b", part1_answer, re.IGNORECASE):
+        return {"sql": None, "reason": "no Form ADV item references in the Part 1 answer"}
+    references = parse_references(part1_answer)
+    if not references:
+        return {"sql": None, "reason": "no column references in the Part 1 answer"}
+    firm = firm_filter(firm_candidates)
+    if firm is None:
+        return {"sql": None, "reason": "the firm in the question did not match closely enough"}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        catalog = load_catalog(conn, table)
+        columns = expand_references(references, catalog)
+        if not columns:
+            return {"sql": None, "reason": "a referenced item has no column in the data"}
+        spans = [match.group(0) for match in THRESHOLD_PATTERN.finditer(question.lower())] + [firm and firm_mention]
+        leftover = leftover_terms(question, column_terms(columns), spans)
+        if leftover:
+            return {"sql": None, "reason": f"the question also mentions {', '.join(leftover)}"}
+        sql, intent = build_query(question, columns, catalog, table, firm)
+        if sql is None:
+            return {"sql": None, "reason": intent}
+        try:
+            conn.execute(f"EXPLAIN {sql}")
+        except sqlite3.Error as e:
+            return {"sql": None, "reason": f"the built query does not compile: {e}"}
+    finally:
+        conn.close()
+    return {"sql": sql, "columns": columns, "intent": intent, "reason": None}
+
+
+def read_only_authorizer(action, *_):
+    return sqlite3.SQLITE_OK if action in READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+# Why `sql` cannot be run as-is, or None when it is a single statement that only reads and that SQLite compiles
+# against the database (and the `attached` ones, see connect_read_only). The statement is compiled on a read-only
+# connection under an authorizer that refuses every non-read action, so "WITH x AS (...) DELETE ..." is caught
+# even though it starts like a query.
+def check_sql(db_path, sql, attached=None):
+    statement = (sql or "").replace("```sql", "").replace("```", "").strip().rstrip(";").strip()
+    if not re.match(r"(select|with)\b", statement, re.IGNORECASE) or ";" in statement:
+        return "not a single SELECT statement"
+    conn = connect_read_only(db_path, attached)
+    try:
+        conn.set_authorizer(read_only_authorizer)
+        conn.execute(f"EXPLAIN {statement}")
+    except sqlite3.DatabaseError as e:
+        return "not a read-only query" if "not authorized" in str(e) else str(e)
+    finally:
+        conn.close()
+    return None
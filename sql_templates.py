@@ -0,0 +1,252 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from aggregates import CLIENT_TYPES, CLIENT_TYPES_TABLE, FLAGS_TABLE, TOTALS_TABLE
+from answer_cache import normalize_question
+from columnar import latest_ingest_id
+from firm_search import resolve_firm
+from retrieval import terms
+from schema import find_key_columns, load_catalog, quote_identifier
+from sql_resolver import (
+    FIRM_MATCH_SCORE, NEGATION_PATTERN, NUMBER_WORDS, THRESHOLD_OPERATORS, UNIT_PATTERN, UNITS, leftover_terms,
+    parse_number, sql_literal,
+)
+
+OPERATOR = r"(?P<op>" + "|".join(sorted(THRESHOLD_OPERATORS, key=len, reverse=True)) + r")"
+NUMBER = (r"(?P<number>\$?\d[\d,]*(?:\.\d+)?|" + "|".join(NUMBER_WORDS) + r")"
+          r"(?:\s*(?P<scale>thousand|million|billion|trillion)\b)?")
+# Every family is anchored at the start of the question, so the thing counted or summed is the thing the
+# template counts or sums ("how many clients do advisers ..." is not a count of advisers)
+LEAD = r"^(?:(?:what|which)(?: is| are| was| were)?(?: the)? |(?:please )?(?:give|tell|show) me (?:the )?)?"
+COUNT = r"(?:how many|(?:the )?(?:total )?number of|count of) "
+ADVISERS = r"(?:(?:the|all|small|registered|sec[- ]registered|investment) )*advis[eo]rs\b"
+
+# Yes/No features a question can ask about, by the SummaryFlags item that counts them, with the words a
+# question may use to describe the feature
+FLAG_TERMS = [
+    ("9A(1)(a)", r"\bcustody\b(?!.*\bsecurities\b).*\b(?:cash|bank accounts?)\b",
+     "custody client cash bank account hold held"),
+    ("9A(1)(b)", r"\bcustody\b(?!.*\b(?:cash|bank accounts?)\b).*\bsecurities\b",
+     "custody client securities hold held"),
+    ("custody_any", r"\bcustody\b(?!.*\b(?:cash|bank accounts?|securities)\b)|\bcustody\b.*\bcash\b.*\bsecurities\b",
+     "custody client cash bank account securities assets funds hold held"),
+    ("portfolio_management_any", r"\bportfolio management\b",
+     "provide offer portfolio management services client"),
+    ("5I(1)", r"\bwrap fee\b", "participate sponsor wrap fee program portfolio manager"),
+    ("5E(1)", r"\bpercentage of assets under management\b",
+     "compensated compensation paid charge services percentage assets under management"),
+    ("5E(2)", r"\bhourly\b", "compensated compensation paid charge services hourly charges fees"),
+    ("5E(3)", r"\bsubscription fees?\b", "compensated compensation paid charge services subscription fees"),
+    ("5E(4)", r"\bfixed fees?\b", "compensated compensation paid charge services fixed fees"),
+    ("5E(5)", r"\bcommissions?\b", "compensated compensation paid services commissions"),
+    ("5E(6)", r"\bperformance[- ]based fees?\b", "compensated compensation paid charge services performance based fees"),
+    ("small_entity", r"\bsmall\b", "small businesses entities"),
+]
+# Item 5.D client types by how a question names them ("high net worth individuals" -> 5D(b)), longest first
+CLIENT_TYPE_TERMS = sorted(
+    ((f"5D({letter})", description.split(" (")[0].lower()) for letter, description in CLIENT_TYPES if letter != "n"),
+    key=lambda term: -len(term[1]),
+)
+
+# Question families that always come down to the same query: name, description, pattern over the normalised
+# question, the words the family may use beyond its parameters, and SQL with :named parameters. {table},
+# {clients} (the blank-as-zero sum of the 5D(x)(1) client counts), {crd} and {op} are filled in from the
+# database and the question before the statement is prepared. A question whose other words are not covered
+# (a qualifier like "based in Texas" or "with more than 100 employees") is left to the LLM.
+TEMPLATES = [
+    ("advisers_by_clients", "Advisers whose number of clients passes a threshold",
+     rf"{LEAD}{COUNT}{ADVISERS} (?:\w+ ){{0,3}}?{OPERATOR}\s+{NUMBER}\s+clients$",
+     "with have each clients",
+     "SELECT COUNT(*) AS advisers FROM {table} WHERE {clients} {op} :threshold"),
+    ("advisers_by_non_us_clients", "Advisers whose share of non-US clients passes a threshold",
+     rf"{LEAD}{COUNT}{ADVISERS} (?:\w+ ){{0,3}}?{OPERATOR}\s+{NUMBER}\s*(?:%|percent) of (?:their )?clients"
+     r" (?:that|who) are non[- ]?(?:united states|us|u\.s\.)(?: persons)?$",
+     "with have clients non united states us u persons",
+     'SELECT COUNT(*) AS advisers FROM {table} WHERE "5C(2)" {op} :threshold'),
+    ("client_type_raum", "Assets under management for one client type",
+     rf"{LEAD}(?:total |combined )?(?:(?:amount|value) of )?(?:the )?(?:regulatory )?assets under management\b",
+     "regulatory assets under management clients advisers managed",
+     f"SELECT raum / :divisor AS total FROM {CLIENT_TYPES_TABLE} WHERE item = :client_type"),
+    ("client_type_clients", "Number of clients of one client type",
+     rf"{LEAD}{COUNT}(?:(?!advis)\w+ ){{0,6}}?clients\b",
+     "clients advisers",
+     f"SELECT clients AS clients FROM {CLIENT_TYPES_TABLE} WHERE item = :client_type"),
+    ("total_raum", "Total regulatory assets under management",
+     rf"{LEAD}(?:total |sum of (?:the )?|aggregate |combined )(?:(?:number|amount|value) of )?(?:the )?(?:regulatory )?"
+     r"assets under management\b",
+     "regulatory assets under management advisers managed",
+     f"SELECT TOTAL(raum) / :divisor AS total FROM {CLIENT_TYPES_TABLE}"),
+    ("total_custody", "Client assets in the custody of advisers and their related persons",
+     rf"{LEAD}(?:total |aggregate |combined )(?:(?:number|amount|value) of )?(?:the )?(?:client )?(?:assets|funds|amount)\b"
+     r".*\bcustody\b",
+     "client assets funds under custody advisers held",
+     f"SELECT TOTAL(total) / :divisor AS total FROM {TOTALS_TABLE} WHERE item IN ('9A(2)(a)', '9B(2)(a)')"),
+    ("flag_fraction", "Fraction of advisers answering a Y/N item, or a combination of items",
+     rf"{LEAD}(?:fraction|proportion|share|percentage|percent) of {ADVISERS}",
+     "",
+     f"SELECT advisers_yes * :ratio / (SELECT total FROM {TOTALS_TABLE} WHERE item = 'advisers') AS fraction "
+     f"FROM {FLAGS_TABLE} WHERE item = :flag"),
+    ("flag_count", "Number of advisers answering a Y/N item, or a combination of items",
+     rf"{LEAD}{COUNT}{ADVISERS}",
+     "",
+     f"SELECT advisers_yes AS advisers FROM {FLAGS_TABLE} WHERE item = :flag"),
+    ("firm_employees", "Employees of one firm (Item 5.A)",
+     rf"{LEAD}{COUNT}employees\b.*\b(?:does|do|at|of|for) (?P<firm>.+?)(?: (?:have|employ))?$",
+     "employees employ full time part both work",
+     'SELECT "5A" AS employees FROM {table} WHERE {crd} = :crd'),
+]
+
+_prepared = {}
+_prepared_lock = threading.Lock()
+
+
+def threshold_parameter(question, match, conn, table):
+    if "number" not in match.groupdict() or match.group("number") == "a" and not match.group("scale"):
+        return None
+    return parse_number(match.group("number"), match.group("scale"))
+
+
+def divisor_parameter(question, match, conn, table):
+    unit = UNIT_PATTERN.search(question)
+    return float(UNITS[unit.group(1).rstrip("s")]) if unit else 1.0
+
+
+def ratio_parameter(question, match, conn, table):
+    return 100.0 if re.search(r"\bpercent(age)?\b", question) else 1.0
+
+
+# The one flag the question is about; questions about related persons' custody (9.B) are left to the LLM
+def flag_parameter(question, match, conn, table):
+    if re.search(r"\brelated persons?\b", question):
+        return None
+    flags = [item for item, pattern, _ in FLAG_TERMS if re.search(pattern, question)]
+    return flags[0] if len(flags) == 1 else None
+
+
+def client_type_parameter(question, match, conn, table):
+    for item, phrase in CLIENT_TYPE_TERMS:
+        if phrase in question:
+            return item
+    return None
+
+
+# CRD number of the firm the question names, when the firm index finds a close enough match
+def crd_parameter(question, match, conn, table):
+    if "firm" not in match.groupdict():
+        return None
+    candidates = resolve_firm(conn, match.group("firm"), table, limit=1)
+    if not candidates or candidates[0]["score"] < FIRM_MATCH_SCORE or candidates[0]["crd"] is None:
+        return None
+    return candidates[0]["crd"]
+
+
+PARAMETERS = {
+    "threshold": threshold_parameter,
+    "divisor": divisor_parameter,
+    "ratio": ratio_parameter,
+    "flag": flag_parameter,
+    "client_type": client_type_parameter,
+    "crd": crd_parameter,
+}
+
+
+# Fill in the table-specific parts of every template and keep the ones SQLite compiles against this database,
+# so a template whose columns or summary tables are missing is never offered
+def compile_templates(conn, table):
+    catalog = load_catalog(conn, table)
+    columns = list(catalog) or [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+    client_columns = [f"5D({letter})(1)" for letter, _ in CLIENT_TYPES if f"5D({letter})(1)" in columns]
+    keys = find_key_columns(columns)
+    parts = {
+        "table": quote_identifier(table),
+        "clients": "(" + " + ".join(f"COALESCE({quote_identifier(column)}, 0)" for column in client_columns) + ")",
+        "crd": quote_identifier(columns[keys[0][1]]) if keys and keys[0][0] == "crd" else "rowid",
+    }
+    compiled = {}
+    for name, description, pattern, words, sql in TEMPLATES:
+        if "{clients}" in sql and not client_columns:
+            continue
+        text = sql.replace("{op}", "{{op}}").format(**parts) if "{" in sql else sql
+        # SQLite reads an unknown "quoted name" as a string, so columns are checked here rather than by EXPLAIN
+        quoted = [name.replace('""', '"') for name in re.findall(r'"((?:[^"]|"")*)"', text)]
+        if any(name not in columns and name != table for name in quoted):
+            continue
+        try:
+            conn.execute(f"EXPLAIN {text.format(op='>')}", {parameter: None for parameter in re.findall(r":(\w+)", text)})
+        except sqlite3.Error:
+            continue
+        compiled[name] = (description, re.compile(pattern), set(terms(words)), text)
+    return compiled
+
+
+# A connection per database file, kept open so SQLite's statement cache holds each template prepared, and the
+# templates compiled for its latest ingest. Reopened when the file is replaced, recompiled after a delta ingest.
+def prepared_templates(db_path, table):
+    inode = os.stat(db_path).st_ino
+    with _prepared_lock:
+        entry = _prepared.get((db_path, table))
+        if entry is None or entry["inode"] != inode:
+            if entry is not None:
+                entry["conn"].close()
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            entry = {"inode": inode, "conn": conn, "ingest_id": None, "templates": None, "lock": threading.Lock()}
+            _prepared[(db_path, table)] = entry
+        with entry["lock"]:
+            ingest_id = latest_ingest_id(entry["conn"])
+            if entry["templates"] is None or entry["ingest_id"] != ingest_id:
+                entry["templates"] = compile_templates(entry["conn"], table)
+                entry["ingest_id"] = ingest_id
+    return entry
+
+
+# Whether every content word of the question is accounted for by the template, the feature or client type
+# it filled in, or the matched threshold and firm name
+def fully_covered(question, match, words, parameters):
+    allowed = set(words)
+    if "flag" in parameters:
+        allowed.update(terms(next(flag_words for item, _, flag_words in FLAG_TERMS if item == parameters["flag"])))
+    if "client_type" in parameters:
+        allowed.update(terms(next(phrase for item, phrase in CLIENT_TYPE_TERMS if item == parameters["client_type"])))
+    spans = [match.group(group) for group in ("op", "number", "scale", "firm") if group in match.groupdict()]
+    return not leftover_terms(question, allowed, spans)
+
+
+# The query with its parameters written in, for display and for re-running in Part 3
+def inline_parameters(sql, parameters):
+    return re.sub(r":(\w+)", lambda match: sql_literal(parameters[match.group(1)]), sql)
+
+
+# Answer a recurring question from its template without any LLM call. Returns {"name", "description", "sql",
+# "result", "seconds"} for the first template whose pattern matches, whose parameters can all be filled and
+# whose words cover the whole question, or None so the caller goes on to the LLM.
+def answer_from_template(db_path, question, table):
+    start = time.perf_counter()
+    question = normalize_question(question)
+    if not question or NEGATION_PATTERN.search(question):
+        return None
+    entry = prepared_templates(db_path, table)
+    with entry["lock"]:
+        for name, (description, pattern, words, sql) in entry["templates"].items():
+            match = pattern.search(question)
+            if not match:
+                continue
+            parameters = {}
+            for parameter in re.findall(r":(\w+)", sql):
+                parameters[parameter] = PARAMETERS[parameter](question, match, entry["conn"], table)
+            if any(value is None for value in parameters.values()) or not fully_covered(question, match, words, parameters):
+                continue
+            statement = sql.format(op=THRESHOLD_OPERATORS[match.group("op")]) if "{op}" in sql else sql
+            row = entry["conn"].execute(statement, parameters).fetchone()
+            if row is None or row[0] is None:
+                continue
+            return {
+                "name": name,
+                "description": description,
+                "sql": inline_parameters(statement, parameters),
+                "result": tuple(row),
+                "seconds": time.perf_counter() - start,
+            }
+    return None
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from aggregates import build_summaries
+from firm_search import build_firm_index
+from sql_templates import answer_from_template
+
+TABLE = "RegisteredAdvisors"
+COLUMNS = ["Organization CRD#", "Primary Business Name", "5A", "5C(2)", "5D(a)(1)", "5D(b)(1)", "5D(a)(3)", "5D(b)(3)",
+           "9A(1)(a)", "9A(1)(b)", "9A(2)(a)", "5I(1)", "5E(5)", "12A", "12B(1)", "12B(2)", "12C(1)", "12C(2)"]
+ROWS = [
+    (101, "American Investors Co", 12, 80, 40, 10, 2e9, 1e9, 1, 1, 5e8, 1, 0, 0, 0, 0, 0, 0),
+    (102, "Smith Capital LLC", 3, 0, 2000, 300, 4e9, 3e9, 0, 1, 1e8, 0, 1, 1, 0, 0, 0, 0),
+    (103, "Lone Star Advisors", 150, 10, 5, 60, 1e8, 5e8, 1, 0, 0, 1, 1, 0, 0, 0, 0, 0),
+]
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("templates") / "advisers.db")
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(f"CREATE TABLE {TABLE} (" + ", ".join(f'"{column}"' for column in COLUMNS) + ")")
+        conn.executemany(f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(COLUMNS))})", ROWS)
+        build_summaries(conn, TABLE)
+        build_firm_index(conn, TABLE)
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("question, name, result", [
+    ("What is the total number of assets under management of the investment advisers, in trillion dollars?",
+     "total_raum", 0.0106),
+    ("What is the number of advisers with each more than one million clients?", "advisers_by_clients", 0),
+    ("What is the number of advisers with more than 100 clients?", "advisers_by_clients", 1),
+    ("What is the total assets under custody of advisers, in trillion dollars?", "total_custody", 0.0006),
+    ("What fraction of advisers have custody of clients' cash or securities?", "flag_fraction", 1.0),
+    ("What is the total number of small registered investment advisers?", "flag_count", 2),
+    ("How many employees (both full-time and part-time) does American Investors Co have?", "firm_employees", 12),
+    ("How many advisers have over 60% of clients that are non-United States persons?", "advisers_by_non_us_clients", 1),
+    ("What percentage of advisers participate in a wrap fee program?", "flag_fraction", 200 / 3),
+    ("What is the total number of advisers who are compensated for their services with commissions?", "flag_count", 2),
+    ("How many advisers have custody of cash?", "flag_count", 2),
+])
+def test_recurring_questions(db_path, question, name, result):
+    answer = answer_from_template(db_path, question, TABLE)
+    assert answer is not None
+    assert answer["name"] == name
+    assert answer["result"][0] == pytest.approx(result)
+
+
+# Qualified variants of the families must go to the LLM rather than answer a broader question
+@pytest.mark.parametrize("question", [
+    "What is the total assets under management of advisers with more than 100 employees?",
+    "How many advisers based in Texas have custody of cash?",
+    "How many advisers based in Texas participate in a wrap fee program?",
+    "How many advisers have more than 50 clients that are high net worth individuals?",
+    "How many clients do advisers with custody of securities have in total?",
+    "How many advisers have more than 100 clients based in Texas?",
+    "What fraction of advisers with more than 10 employees have custody of cash?",
+    "How many advisers do not have custody of cash?",
+    "How many employees does Unknown Partners have?",
+])
+def test_qualified_questions_are_not_templated(db_path, question):
+    assert answer_from_template(db_path, question, TABLE) is None
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+VECTOR_DIR = "vector_index"
+VECTORS_FILE = "vectors.bin"
+SCALES_FILE = "scales.bin"
+META_FILE = "meta.json"
+HASHING_DIM = 1024
+SEARCH_BATCH_ROWS = 65536
+
+_loaded = {}
+
+
+# Offline embedder: signed feature hashing of word unigrams and bigrams with sublinear term frequency.
+# Needs no vocabulary, so new texts can be added without re-embedding the old ones.
+class HashingEmbedder:
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def features(self, text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def __call__(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self.features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                slot, sign = digest % self.dim, 1.0 if digest >> 63 else -1.0
+                counts[slot] = counts.get(slot, 0.0) + sign
+            for slot, value in counts.items():
+                matrix[row, slot] = np.sign(value) * (1.0 + np.log(abs(value))) if value else 0.0
+        return matrix
+
+
+# Embedder backed by the OpenAI embeddings endpoint, for when the network is available
+class OpenAIEmbedder:
+    def __init__(self, client, model="text-embedding-3-small", dim=1536):
+        self.client = client
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}"
+
+    def __call__(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# Brute-force cosine index. Unit-normalised vectors are appended to a raw float32 (or int8 with one scale
+# per row) file that is memory-mapped for search; ids, texts and metadata live in a JSON sidecar whose
+# "count" says how many rows of the file are valid, so an interrupted append is simply ignored.
+class VectorIndex:
+    def __init__(self, directory=VECTOR_DIR, embedder=None, dtype="float32"):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta["embedder"] != self.embedder.name:
+                raise ValueError(f"{directory} was built with {self.meta['embedder']}, not {self.embedder.name}")
+        else:
+            self.meta = {"embedder": self.embedder.name, "dim": self.embedder.dim, "dtype": dtype, "count": 0, "items": []}
+        self.positions = {item["id"]: i for i, item in enumerate(self.meta["items"])}
+        self.vectors = None
+        self.scales = None
+        self.map()
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def map(self):
+        count, dim = self.meta["count"], self.meta["dim"]
+        if not count:
+            self.vectors = self.scales = None
+            return
+        dtype = np.int8 if self.meta["dtype"] == "int8" else np.float32
+        self.vectors = np.memmap(self.path(VECTORS_FILE), dtype=dtype, mode="r", shape=(count, dim))
+        if self.meta["dtype"] == "int8":
+            self.scales = np.memmap(self.path(SCALES_FILE), dtype=np.float32, mode="r", shape=(count,))
+
+    def encode(self, matrix):
+        if self.meta["dtype"] != "int8":
+            return matrix.astype(np.float32), None
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def write_meta(self):
+        building = self.path(META_FILE + ".building")
+        with open(building, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(building, self.path(META_FILE))
+
+    # Embed and store texts. New ids are appended to the end of the files; known ids are overwritten in place.
+    def add(self, ids, texts, metadatas=None, embeddings=None):
+        if not ids:
+            return 0
+        metadatas = metadatas or [{} for _ in ids]
+        matrix = embeddings if embeddings is not None else self.embedder(texts)
+        encoded, scales = self.encode(normalize_rows(np.asarray(matrix, dtype=np.float32)))
+        os.makedirs(self.directory, exist_ok=True)
+        new_rows = [i for i, item_id in enumerate(ids) if item_id not in self.positions]
+        old_rows = [i for i, item_id in enumerate(ids) if item_id in self.positions]
+        count = self.meta["count"]
+        self.vectors = self.scales = None
+        with open(self.path(VECTORS_FILE), "ab") as f:
+            f.truncate(count * encoded.itemsize * self.meta["dim"])
+            f.write(encoded[new_rows].tobytes())
+        if scales is not None:
+            with open(self.path(SCALES_FILE), "ab") as f:
+                f.truncate(count * 4)
+                f.write(scales[new_rows].tobytes())
+        if old_rows:
+            dtype = np.int8 if scales is not None else np.float32
+            vectors = np.memmap(self.path(VECTORS_FILE), dtype=dtype, mode="r+", shape=(count + len(new_rows), self.meta["dim"]))
+            positions = [self.positions[ids[i]] for i in old_rows]
+            vectors[positions] = encoded[old_rows]
+            vectors.flush()
+            del vectors
+            if scales is not None:
+                stored = np.memmap(self.path(SCALES_FILE), dtype=np.float32, mode="r+", shape=(count + len(new_rows),))
+                stored[positions] = scales[old_rows]
+                stored.flush()
+                del stored
+        for i in old_rows:
+            self.meta["items"][self.positions[ids[i]]] = {"id": ids[i], "text": texts[i], "metadata": metadatas[i]}
+        for i in new_rows:
+            self.positions[ids[i]] = len(self.meta["items"])
+            self.meta["items"].append({"id": ids[i], "text": texts[i], "metadata": metadatas[i]})
+        self.meta["count"] = len(self.meta["items"])
+        self.write_meta()
+        self.map()
+        return len(new_rows)
+
+    # Cosine similarity of every query against every stored row, computed block by block with matrix multiplies
+    def similarities(self, queries):
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SEARCH_BATCH_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BATCH_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+            if self.scales is not None:
+                scores[:, start:start + len(block)] *= self.scales[start:start + len(block)]
+        return scores
+
+    # Top-k (score, item) pairs for each query text, best first
+    def search_many(self, texts, k=5, embeddings=None):
+        if not len(self):
+            return [[] for _ in texts]
+        queries = normalize_rows(np.asarray(embeddings if embeddings is not None else self.embedder(texts), dtype=np.float32))
+        scores = self.similarities(queries)
+        k = min(k, len(self))
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(float(row[i]), self.meta["items"][i]) for i in top])
+        return results
+
+    def search(self, text, k=5):
+        return self.search_many([text], k)[0]
+
+
+# Index at `directory`, opened once per process and reused while its sidecar is unchanged
+def load_index(directory=VECTOR_DIR, embedder=None):
+    path = os.path.join(directory, META_FILE)
+    stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    cached = _loaded.get(directory)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    index = VectorIndex(directory, embedder)
+    _loaded[directory] = (stamp, index)
+    return index